@@ -0,0 +1,38 @@
+from enum import IntEnum
+
+# Player.last_action values. Each state is its own bit so groups of states can be tested with one mask:
+#   if player.last_action & Action.GONE: ...
+# (IntEnum's & gives a plain int, no enum lookup on the hot path)
+# The lowercase names ("wait", "all_in", ...) are what the UI, the AI state dict and old save files use.
+class Action(IntEnum):
+  NONE = 0 # not readied for a game yet
+  WAIT = 1 << 0 # hasn't acted this betting round
+  FOLD = 1 << 1
+  CALL = 1 << 2
+  RAISE = 1 << 3
+  ALL_IN = 1 << 4
+  POT_COMMITTED = 1 << 5 # went all in during an earlier betting round
+  PENDING_OUT = 1 << 6 # the game ended and the player will be out on the next round
+  OUT = 1 << 7
+  BLIND = 1 << 8 # only passed to GameInstance.execute_player_action, stored as WAIT or ALL_IN
+
+  # masks
+  GONE = FOLD | PENDING_OUT | OUT # not contesting the pot
+  NOT_IN = GONE | POT_COMMITTED # not betting anymore this game
+  CANT_ACT = GONE | ALL_IN # can't bet, see Player.can_do_action
+
+  @property
+  def label(self):
+    return self.name.lower()
+
+  # "all_in" / Action.ALL_IN -> Action.ALL_IN, None -> Action.NONE. Raises ValueError for anything else
+  @staticmethod
+  def parse(value):
+    if value is None:
+      return Action.NONE
+    if isinstance(value, Action):
+      return value
+    try:
+      return Action[value.upper()]
+    except (KeyError, AttributeError):
+      raise ValueError(f"Unknown action {value!r}")
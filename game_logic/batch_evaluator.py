@@ -0,0 +1,120 @@
+import numpy as np
+from game_logic.card import Card
+from game_logic.hand_evaluator import HandEvaluator
+
+# Vectorized version of HandEvaluator for scoring many hands at once (training, equity tables, regression checks)
+# Every hand class is worked out from per-row rank and suit histograms with NumPy array operations,
+# so there is no Python loop per hand. Scores are identical to HandEvaluator.evaluate / CardRanker.find_best_hand.
+class BatchEvaluator:
+
+  # rows are scored in chunks so the (chunk, 13) work arrays stay small
+  CHUNK_SIZE = 1 << 16
+
+  # highest set bit of every 13-bit rank mask, -1 for an empty mask
+  HIGH_BIT = np.full(1 << 13, -1, dtype=np.int64)
+  for _bit in range(13):
+    HIGH_BIT[1 << _bit : 1 << (_bit + 1)] = _bit
+  del _bit
+
+  RANK_BITS = 1 << np.arange(13, dtype=np.int64)
+  PLACES = np.array([10**12] + [10**(10 - 2*i) for i in range(5)], dtype=np.int64)
+
+  # Score an (N, 7) int array of cards (Card.NA allowed as padding)
+  # Returns (scores, hand_classes): both (N,), hand class 1=high card ... 9=straight flush,
+  # see HandEvaluator.HAND_LABELS for the label text
+  @staticmethod
+  def evaluate(cards):
+    cards = np.asarray(cards, dtype=np.int64)
+    if cards.ndim != 2:
+      raise ValueError("Expected an (N, 7) array of cards, got shape " + str(cards.shape))
+
+    scores = np.empty(len(cards), dtype=np.int64)
+    for start in range(0, len(cards), BatchEvaluator.CHUNK_SIZE):
+      end = start + BatchEvaluator.CHUNK_SIZE
+      scores[start:end] = BatchEvaluator.evaluate_chunk(cards[start:end])
+    return scores, (scores // 10**12).astype(np.int8)
+
+  @staticmethod
+  def evaluate_chunk(cards):
+    n, width = cards.shape
+    rows = np.arange(n)
+    ranks = cards >> 2 # Card.NA lands in the unused rank 13
+    suits = cards & 3
+    known = cards != Card.NA
+
+    # rank histogram and 13-bit mask of the ranks that are present
+    offsets = (rows * 14)[:, None]
+    rank_counts = np.bincount((offsets + ranks).ravel(), minlength=n * 14).reshape(n, 14)[:, :13]
+    rank_mask = (rank_counts > 0) @ BatchEvaluator.RANK_BITS
+
+    # suit histogram and the rank mask of each suit
+    suit_cards = np.where(known, suits, 4)
+    suit_counts = np.bincount(((rows * 5)[:, None] + suit_cards).ravel(), minlength=n * 5).reshape(n, 5)[:, :4]
+    card_bits = np.where(known, 1 << np.minimum(ranks, 12), 0)
+    suit_masks = np.stack([np.bitwise_or.reduce(card_bits * (suit_cards == s), axis=1) for s in range(4)], axis=1)
+
+    # order ranks by (count, rank) so the first two entries are the biggest groups
+    groups = np.sort(rank_counts * 16 + np.arange(13), axis=1)
+    count0, rank0 = groups[:, -1] >> 4, groups[:, -1] & 15
+    count1, rank1 = groups[:, -2] >> 4, groups[:, -2] & 15
+
+    scores = np.zeros(n, dtype=np.int64)
+    done = np.zeros(n, dtype=bool)
+
+    def assign(hit, hand_class, values):
+      hit = hit & ~done
+      score = hand_class * BatchEvaluator.PLACES[0]
+      for i, value in enumerate(values):
+        score = score + value * BatchEvaluator.PLACES[i + 1]
+      scores[hit] = np.broadcast_to(score, (n,))[hit]
+      done[hit] = True
+
+    # 5+ cards of a suit (a flush rules out quads and full houses with 7 cards)
+    flush_suit = suit_counts.argmax(axis=1)
+    has_flush = suit_counts[rows, flush_suit] >= 5
+    flush_mask = np.where(has_flush, suit_masks[rows, flush_suit], 0)
+    flush_straight = BatchEvaluator.straight_values(flush_mask)
+    flush_high = np.where(flush_straight == HandEvaluator.WHEEL_VALUE, 0, flush_straight)
+    straight_flush_values = [flush_straight] + [np.where(flush_high > 0, flush_high - i, 0) for i in range(1, 5)]
+    assign(has_flush & (flush_straight > 0), 9, straight_flush_values)
+    assign(has_flush, 6, BatchEvaluator.top_values(flush_mask, 5))
+
+    value0 = rank0 + 12
+    value1 = rank1 + 12
+    without0 = rank_mask & ~(1 << rank0)
+
+    assign(count0 == 4, 8, [value0] + BatchEvaluator.top_values(without0, 1))
+    assign((count0 == 3) & (count1 >= 2), 7, [value0, value1])
+
+    straight = BatchEvaluator.straight_values(rank_mask)
+    assign(straight > 0, 5, [straight])
+
+    assign(count0 == 3, 4, [value0] + BatchEvaluator.top_values(without0, 2))
+    two_pair = (count0 == 2) & (count1 == 2)
+    assign(two_pair, 3, [value0, value1] + BatchEvaluator.top_values(without0 & ~(1 << rank1), 1))
+    assign(count0 == 2, 2, [value0] + BatchEvaluator.top_values(without0, 3))
+    assign(np.ones(n, dtype=bool), 1, BatchEvaluator.top_values(rank_mask, 5))
+
+    return scores
+
+  # card values of the k highest ranks in each mask, 0 where the mask runs out
+  @staticmethod
+  def top_values(masks, k):
+    values = []
+    masks = masks.copy()
+    for _ in range(k):
+      high = BatchEvaluator.HIGH_BIT[masks]
+      present = high >= 0
+      values.append(np.where(present, high + 12, 0))
+      masks = np.where(present, masks ^ (1 << np.maximum(high, 0)), masks)
+    return values
+
+  # value of the best straight in each rank mask (HandEvaluator.straight_value), 0 for none
+  @staticmethod
+  def straight_values(masks):
+    # bit i of `runs` is set when ranks i..i+4 are all present
+    runs = masks & (masks >> 1) & (masks >> 2) & (masks >> 3) & (masks >> 4)
+    high = BatchEvaluator.HIGH_BIT[runs]
+    values = np.where(high >= 0, high + 4 + 12, 0)
+    wheel = (masks & HandEvaluator.WHEEL_MASK) == HandEvaluator.WHEEL_MASK
+    return np.where(wheel, HandEvaluator.WHEEL_VALUE, values)
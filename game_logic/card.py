@@ -0,0 +1,64 @@
+# Cards are stored as ints inside game_logic: card = rank_index * 4 + suit_index
+# E.g. "2C" -> 0, "2D" -> 1, ..., "AS" -> 51. An unknown card (not dealt/scanned yet) is 52.
+# Strings like "AH" are only used at the edges: classifier output, card images and old save files.
+class Card:
+  RANKS = "23456789TJQKA"
+  SUITS = "CDHS"
+  NA = 52
+  NA_SYMBOL = "NA"
+
+  STRINGS = [r + s for r in "23456789TJQKA" for s in "CDHS"] + ["NA"]
+  FROM_STRING = dict(zip(STRINGS, range(53)))
+
+  ASSET_SUIT_FOLDERS = {"C" : "clubs", "D" : "diamonds", "H" : "hearts", "S" : "spades"}
+
+  @staticmethod
+  def rank(card):
+    return card >> 2
+
+  @staticmethod
+  def suit(card):
+    return card & 3
+
+  # 52-bit mask with one bit per card, unknown cards are left out
+  @staticmethod
+  def mask(cards):
+    res = 0
+    for card in cards:
+      if card != Card.NA:
+        res |= 1 << card
+    return res
+
+  # "AH" -> 50
+  @staticmethod
+  def from_str(card):
+    return Card.FROM_STRING[card]
+
+  # 50 -> "AH"
+  @staticmethod
+  def to_str(card):
+    return Card.STRINGS[card]
+
+  @staticmethod
+  def from_strs(cards):
+    return [Card.FROM_STRING[card] for card in cards]
+
+  @staticmethod
+  def to_strs(cards):
+    if cards is None:
+      return None
+    return [Card.STRINGS[card] for card in cards]
+
+  # Save files written before cards were ints hold strings, newer ones hold ints
+  @staticmethod
+  def from_saved(cards):
+    if cards is None:
+      return None
+    return [Card.FROM_STRING[card] if isinstance(card, str) else card for card in cards]
+
+  # Image file for a card, e.g. 48 ("AC") -> "assets/cards/clubs/A.png"
+  @staticmethod
+  def asset_path(card):
+    card = Card.STRINGS[card]
+    rank = "10" if card[0] == "T" else card[0]
+    return "assets/cards/" + Card.ASSET_SUIT_FOLDERS[card[1]] + "/" + rank + ".png"
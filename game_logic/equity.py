@@ -0,0 +1,196 @@
+import functools
+import itertools
+import math
+import time
+import numpy as np
+from game_logic.card import Card
+from game_logic.batch_evaluator import BatchEvaluator
+from game_logic.preflop_table import PreflopTable
+
+
+# Result of an equity calculation for one player
+# win:     chance of holding the best hand alone
+# tie:     chance of splitting the best hand with at least one opponent
+# equity:  expected share of the pot (a win counts 1, a split between k players counts 1/k)
+# margin:  half width of the 95% confidence interval around `equity` (0 when exact)
+class EquityResult:
+  def __init__(self, win, tie, equity, margin, samples):
+    self.win = win
+    self.tie = tie
+    self.equity = equity
+    self.margin = margin
+    self.samples = samples
+
+  def interval(self):
+    return max(0.0, self.equity - self.margin), min(1.0, self.equity + self.margin)
+
+  def __str__(self):
+    return (f"equity {self.equity:.3f} +/- {self.margin:.3f} " +
+            f"(win {self.win:.3f}, tie {self.tie:.3f}, {self.samples} samples)")
+
+
+class Equity:
+  # number of runouts drawn and scored per BatchEvaluator call
+  BATCH_SIZE = 500
+
+  # z value for a 95% confidence interval
+  CONFIDENCE_Z = 1.96
+
+  # all 1326 two card hands, plus each one as a 52-bit card mask
+  HOLE_COMBOS = np.array(list(itertools.combinations(range(52), 2)), dtype=np.int64)
+  HOLE_MASKS = (np.int64(1) << HOLE_COMBOS[:, 0]) | (np.int64(1) << HOLE_COMBOS[:, 1])
+  HOLE_INDEX = {(a, b) : i for i, (a, b) in enumerate(itertools.combinations(range(52), 2))}
+
+  # `estimate` enumerates exactly when it takes at most this many board completions
+  EXACT_MAX_BOARDS = 46
+
+  # Equity against `n_opponents` random hands: read from the preflop table before the flop,
+  # exact when heads up with at most one board card to come, otherwise sampled within the given budget
+  @staticmethod
+  def estimate(hole_cards, community_cards, n_opponents, samples=2000, time_limit=None, rng=None):
+    n_missing = community_cards.count(Card.NA)
+    if n_missing == 5:
+      preflop = PreflopTable.lookup(hole_cards, n_opponents)
+      if preflop is not None:
+        win, tie, equity, margin = (float(x) for x in preflop)
+        return EquityResult(win, tie, equity, margin, 0)
+
+    n_boards = math.comb(52 - 2 - (5 - n_missing), n_missing)
+    if n_opponents == 1 and n_boards <= Equity.EXACT_MAX_BOARDS:
+      return Equity.exact(hole_cards, community_cards)
+    return Equity.monte_carlo(hole_cards, community_cards, n_opponents, samples, time_limit, rng)
+
+  # Estimate equity by sampling the unknown cards.
+  # Unknown community cards (Card.NA) and every opponent's hole cards are drawn from the cards
+  # that are not in `hole_cards` or on the board. Sampling stops after `samples` runouts or once
+  # `time_limit` seconds have passed (at least one batch is always scored).
+  @staticmethod
+  def monte_carlo(hole_cards, community_cards, n_opponents, samples=2000, time_limit=None, rng=None):
+    totals, n_samples = Equity.sample_totals(hole_cards, community_cards, n_opponents, samples, time_limit, rng)
+    return Equity.to_result(totals, n_samples)
+
+  # Sampling loop of `monte_carlo`. Returns the raw totals (wins, ties, equity sum, equity sum of
+  # squares) and the sample count, so results from several runs can be added up before `to_result`
+  @staticmethod
+  def sample_totals(hole_cards, community_cards, n_opponents, samples, time_limit=None, rng=None):
+    if rng is None:
+      rng = np.random.default_rng()
+    board = [c for c in community_cards if c != Card.NA]
+    deck = np.setdiff1d(np.arange(52), hole_cards + board)
+    n_draw = (5 - len(board)) + 2 * n_opponents
+
+    start = time.perf_counter()
+    totals = np.zeros(4)
+    n_samples = 0
+    while n_samples < samples:
+      batch = min(Equity.BATCH_SIZE, samples - n_samples)
+      order = np.argsort(rng.random((batch, len(deck))), axis=1)[:, :n_draw]
+      shares = Equity.score_runouts(hole_cards, board, deck[order], n_opponents)
+      totals += Equity.summarize(shares)
+      n_samples += batch
+      if time_limit is not None and time.perf_counter() - start >= time_limit:
+        break
+    return totals, n_samples
+
+  # Exact equity heads up against one random hand.
+  # Every board completion and every opponent hole card pair that is still possible is counted.
+  # Cost grows with the missing board cards: 1 board on the river, 46 on the turn, 1081 on the flop
+  @staticmethod
+  def exact(hole_cards, community_cards):
+    board = [c for c in community_cards if c != Card.NA]
+    deck = [c for c in range(52) if c not in hole_cards and c not in board]
+    hole_mask = Card.mask(hole_cards)
+
+    totals = np.zeros(4)
+    n_samples = 0
+    for completion in itertools.combinations(deck, 5 - len(board)):
+      full_board = tuple(sorted(board + list(completion)))
+      rankings = Equity.board_rankings(full_board)
+      hero = rankings[Equity.HOLE_INDEX[tuple(sorted(hole_cards))]]
+
+      # opponent hands that don't use the player's cards or the board
+      possible = (Equity.HOLE_MASKS & (hole_mask | Card.mask(full_board))) == 0
+      opponents = rankings[possible]
+      wins = int((hero > opponents).sum())
+      ties = int((hero == opponents).sum())
+      totals += [wins, ties, wins + ties / 2, wins + ties / 4]
+      n_samples += len(opponents)
+
+    return Equity.to_result(totals, n_samples, exact=True)
+
+  # Exact equity of players whose hole cards are all known (e.g. at showdown).
+  # Each board completion is scored once per player; returns one EquityResult per hand
+  @staticmethod
+  def exact_showdown(hands, community_cards):
+    board = [c for c in community_cards if c != Card.NA]
+    dead = board + [c for hand in hands for c in hand]
+    deck = [c for c in range(52) if c not in dead]
+
+    completions = list(itertools.combinations(deck, 5 - len(board)))
+    n_boards = len(completions)
+    completions = np.array(completions, dtype=np.int64).reshape(n_boards, 5 - len(board))
+    boards = np.concatenate([np.broadcast_to(np.array(board, dtype=np.int64), (n_boards, len(board))), completions], axis=1)
+
+    holes = np.array(hands, dtype=np.int64)
+    rows = np.concatenate([np.broadcast_to(holes[None, :, :], (n_boards, len(hands), 2)),
+                           np.broadcast_to(boards[:, None, :], (n_boards, len(hands), 5))], axis=2)
+    scores = BatchEvaluator.evaluate(rows.reshape(-1, 7))[0].reshape(n_boards, len(hands))
+
+    best = scores.max(axis=1, keepdims=True)
+    winners = scores == best
+    shares = winners / winners.sum(axis=1, keepdims=True)
+    return [Equity.to_result(Equity.summarize(shares[:, i]), n_boards, exact=True) for i in range(len(hands))]
+
+  # Score of every two card hand on a complete 5 card board, -1 for hands that use a board card.
+  # Memoized so each runout is only evaluated once, however many players and calls look at it
+  @staticmethod
+  @functools.lru_cache(maxsize=512)
+  def board_rankings(board):
+    possible = (Equity.HOLE_MASKS & Card.mask(board)) == 0
+    holes = Equity.HOLE_COMBOS[possible]
+    rows = np.concatenate([holes, np.broadcast_to(np.array(board, dtype=np.int64), (len(holes), 5))], axis=1)
+    scores = np.full(len(Equity.HOLE_COMBOS), -1, dtype=np.int64)
+    scores[possible] = BatchEvaluator.evaluate(rows)[0]
+    scores.flags.writeable = False
+    return scores
+
+  # Pot share of the player for each runout.
+  # `draws` is (runouts, k) cards: first the missing board cards, then 2 hole cards per opponent
+  @staticmethod
+  def score_runouts(hole_cards, board, draws, n_opponents):
+    n_runouts = len(draws)
+    n_missing = 5 - len(board)
+    boards = np.concatenate([np.broadcast_to(np.array(board, dtype=np.int64), (n_runouts, len(board))),
+                             draws[:, :n_missing]], axis=1)
+
+    hero = np.concatenate([np.broadcast_to(np.array(hole_cards, dtype=np.int64), (n_runouts, 2)), boards], axis=1)
+    hero_scores = BatchEvaluator.evaluate(hero)[0]
+    if n_opponents == 0:
+      return np.ones(n_runouts)
+
+    opponent_holes = draws[:, n_missing:].reshape(n_runouts, n_opponents, 2)
+    opponents = np.concatenate([opponent_holes,
+                                np.broadcast_to(boards[:, None, :], (n_runouts, n_opponents, 5))], axis=2)
+    opponent_scores = BatchEvaluator.evaluate(opponents.reshape(-1, 7))[0].reshape(n_runouts, n_opponents)
+
+    best_opponent = opponent_scores.max(axis=1)
+    tied = (opponent_scores == hero_scores[:, None]).sum(axis=1)
+    return np.where(hero_scores > best_opponent, 1.0,
+                    np.where(hero_scores == best_opponent, 1.0 / (tied + 1), 0.0))
+
+  @staticmethod
+  def summarize(shares):
+    return np.array([(shares == 1.0).sum(),
+                     ((shares > 0.0) & (shares < 1.0)).sum(),
+                     shares.sum(),
+                     (shares * shares).sum()])
+
+  @staticmethod
+  def to_result(totals, n_samples, exact=False):
+    wins, ties, total, total_sq = totals
+    equity = total / n_samples
+    margin = 0.0
+    if not exact and n_samples > 1:
+      variance = max(0.0, total_sq / n_samples - equity * equity)
+      margin = Equity.CONFIDENCE_Z * float(np.sqrt(variance / n_samples))
+    return EquityResult(wins / n_samples, ties / n_samples, equity, margin, n_samples)
@@ -1,12 +1,21 @@
+from game_logic.action import Action
+from game_logic.card import Card
 from game_logic.deck import Deck
 from game_logic.card_ranker import CardRanker
+from game_logic.hand_tracker import HandTracker
+from game_logic.equity import Equity
+from game_logic.observation import Observation
+from game_logic.opponent_stats import OpponentStats
 from game_logic.player import Player
-from game_logic.pot import TempPot
+from game_logic.pot import Pot, TempPot
 from game_logic.poker_agent import predict_ai_move
+import logging
 import random
 from enum import Enum
 from objects.gamestate import GameState
 
+log = logging.getLogger(__name__)
+
 
 class GameInstance:
   class StartResponse(Enum):
@@ -26,34 +35,113 @@ class GameInstance:
   SMALL_BLIND = 5
   BIG_BLIND = 10
 
+  # budget for the AI's equity estimate on its turn, whichever runs out first
+  # (heads up on the turn and river the equity is enumerated exactly instead)
+  # AI_EQUITY_SAMPLES = 0 skips the estimate and leaves `ai_equity` as None (the agent then assumes an
+  # even share of the pot). Off by default: the agent's equity weights are zero until trained, so the
+  # estimate would cost up to AI_EQUITY_TIME_LIMIT per AI turn without changing a decision
+  AI_EQUITY_SAMPLES = 0
+  AI_EQUITY_TIME_LIMIT = 0.05 # seconds
+
   def __init__(self, players):
     self.players = players
     self.game_active = False
     self.dealer_pos = random.randint(0, len(self.players))
     self.curr_pos = 0
     self.round = None
+    self.hand_trackers = {} # player id -> HandTracker for the current game
+    self.deck_rng = None # random.Random used to shuffle each new deck, None uses the `random` module
+    self.observations = [Observation() for _ in players] # one per seat, see get_observation
+    self.opponent_stats = OpponentStats(len(players)) # how each seat has played so far, across games
+    self.seat_rates = [OpponentStats.PRIOR] * len(players) # opponent_stats.rates of each seat, see reset_observations
+    self.contesting_rates = [0.0] * len(OpponentStats.RATES)
+    self.recount()
 
   # Check which players can start a new game and return that number
   def ready_up_players(self):
     ready_players = 0
     for player in self.players:
+      player.curr_bet = 0 # left over from the last betting round of the previous game
       if player.chips == 0:
-        player.last_action = "out"
+        player.last_action = Action.OUT
       else:
-        player.last_action = "wait"
+        player.last_action = Action.WAIT
         ready_players += 1
     return ready_players
 
+  # Live counts of player states, so round checks don't have to look at every player.
+  # They are rebuilt by `recount` once per betting round and kept up to date by `execute_player_action`,
+  # the only place a player's state changes in the middle of a round:
+  #   n_gone:       folded or out
+  #   n_committed:  all in during an earlier round (pot_committed)
+  #   n_wait:       haven't acted yet this round
+  #   n_can_act:    can still bet (Player.can_do_action)
+  #   n_matched:    can still bet and have bet `highest_bet` this round
+  # Players who can still bet are also linked into a ring (`ring_next`/`ring_prev`, indexed by seat)
+  # so finding the next player to act skips everyone else without looking at them.
+  def recount(self):
+    tmp_pot = getattr(self, "tmp_pot", None)
+    self.highest_bet = tmp_pot.highest_bet() if tmp_pot is not None else 0
+    self.n_gone = self.n_committed = self.n_wait = self.n_can_act = self.n_matched = 0
+    for player in self.players:
+      self.tally_player(player, 1)
+
+    active = [pos for pos, player in enumerate(self.players) if player.can_do_action()]
+    n_players = len(self.players)
+    self.in_ring = [False] * n_players
+    self.ring_next = [(pos + 1) % n_players for pos in range(n_players)]
+    self.ring_prev = [(pos - 1) % n_players for pos in range(n_players)]
+    for i, pos in enumerate(active):
+      self.in_ring[pos] = True
+      self.ring_next[pos] = active[(i + 1) % len(active)]
+      self.ring_prev[pos] = active[i - 1]
+    # seats outside the ring point at the next seat in it, as if they had just been taken out
+    if active:
+      next_active = active[0]
+      for pos in range(n_players - 1, -1, -1):
+        if self.in_ring[pos]:
+          next_active = pos
+        else:
+          self.ring_next[pos] = next_active
+
+  # add (sign=1) or remove (sign=-1) a player's current state from the counts
+  def tally_player(self, player, sign):
+    action = player.last_action
+    if action & Action.GONE:
+      self.n_gone += sign
+    elif action == Action.POT_COMMITTED:
+      self.n_committed += sign
+    elif action == Action.WAIT:
+      self.n_wait += sign
+    if player.chips > 0 and not action & Action.CANT_ACT:
+      self.n_can_act += sign
+      if player.curr_bet == self.highest_bet:
+        self.n_matched += sign
+
+  # take a seat out of the ring once its player can't bet anymore this game
+  def leave_ring(self, pos):
+    if not self.in_ring[pos]:
+      return
+    self.in_ring[pos] = False
+    nxt, prev = self.ring_next[pos], self.ring_prev[pos]
+    if nxt == pos: # last seat in the ring
+      return
+    self.ring_next[prev] = nxt
+    self.ring_prev[nxt] = prev
+
   # Given a current player position, get the next player's
   # position who is still active (chips > 0 and necessary last_action)
   # THIS METHOD SHOULD NOT BE REACHABLE IF THERE ARE NO NEXT ACTIVE PLAYERS
   # THERE SHOULD BE PRIOR CHECKS IN PLACE FOR `self.is_round_over()` TO END ROUND
   def get_next_pos(self, pos):
-    n_players = len(self.players)
-    player_inactive = True
-    while player_inactive:
-      pos = (pos + 1) % n_players
-      player_inactive = self.players[pos].chips <= 0 or self.players[pos].last_action in ["pending_out", "out", "fold", "all_in", "pot_committed"]
+    pos = self.ring_next[pos % len(self.players)]
+    # a seat that left the ring still points where the ring continued at the time,
+    # follow it along until it reaches a seat that is still in
+    while not self.in_ring[pos]:
+      if self.n_can_act == 0:
+        log.error("get_next_pos: no player can act")
+        return pos
+      pos = self.ring_next[pos]
     return pos
 
   def increment_curr_pos(self):
@@ -70,23 +158,23 @@ class GameInstance:
   def get_min_required_bet(self, player=None):
     if not player:
       player = self.players[self.curr_pos]
-    return self.tmp_pot.highest_bet() - self.tmp_pot.bets[player.id]
+    return self.highest_bet - self.tmp_pot.bets[player.id]
 
 
   # setup all variables for a new game state
   def start_game(self):
     # Don't start a new game if one is in progress already
     if self.game_active:
-      print("Error: Cannot start a new game because a game is in progress.")
+      log.error("Cannot start a new game because a game is in progress.")
       return GameState.ERROR_STATE
 
     # Check if enough players have chips to start a new gme
     if self.ready_up_players() < 2:
-      print("Error: Cannot start a new game because not enough players have chips.")
+      log.error("Cannot start a new game because not enough players have chips.")
       return GameState.ERROR_STATE
 
     # Setup all variables
-    self.deck = Deck()
+    self.deck = Deck(self.deck_rng)
 
     # keep track of a single pot that can be split into side pots
     # NOTE: at the end of the game, this pot will be forced into side pots
@@ -97,11 +185,20 @@ class GameInstance:
     # store main & side pots for winnings distribution
     self.side_pots = []
 
+    # running totals so pot sizes don't have to be summed up from the pots
+    self.pot_round = 0 # chips in tmp_pot
+    self.pot_game = 0 # chips in tmp_pot and side_pots
+    self.committed = {player.id : 0 for player in self.players} # chips each player has put in this game
+
     self.round = self.GameRound.PREFLOP
     self.community_cards = [Deck.UNKNOWN_CARD_SYMBOL for _ in range(5)]
+    self.hand_trackers = {}
+    self.recount()
+    self.opponent_stats.start_hand(self.players)
     self.increment_dealer_pos()
     self.curr_pos = self.dealer_pos # game starts from dealer position
     self.game_active = True
+    self.reset_observations()
 
     # If a physical deck is not being used, deal all the cards to the players
     if not GameInstance.USE_PHYSICAL_DECK:
@@ -110,6 +207,25 @@ class GameInstance:
     
     return GameState.SCAN_AI_HAND
 
+  # Reveal a community card. Use this rather than writing to `community_cards` directly
+  # so every player's HandTracker picks up the new card
+  def set_community_card(self, index, card):
+    if self.community_cards[index] != Deck.UNKNOWN_CARD_SYMBOL:
+      # a card is being replaced (e.g. rescanned), trackers are rebuilt when next read
+      self.hand_trackers = {}
+    self.community_cards[index] = card
+    for tracker in self.hand_trackers.values():
+      tracker.add_card(card)
+
+  # HandTracker for a player's hole cards and the current board.
+  # A new tracker is made the first time or if the player's cards were scanned/changed since
+  def get_hand_tracker(self, player):
+    tracker = self.hand_trackers.get(player.id)
+    if tracker is None or tracker.hole_cards != player.cards:
+      tracker = HandTracker(player.cards, self.community_cards)
+      self.hand_trackers[player.id] = tracker
+    return tracker
+
   def await_player_action(self, player):
     print(GameInstance.divider("Player Action"))
     print(player)
@@ -117,7 +233,7 @@ class GameInstance:
     p_action = None
 
     while p_action is None:
-      p_action = input(f"Bet requirement: {self.tmp_pot.highest_bet() - self.tmp_pot.bets[player.id]}\nMake your move (fold, call, raise, all_in):")
+      p_action = input(f"Bet requirement: {self.get_min_required_bet(player)}\nMake your move (fold, call, raise, all_in):")
       if p_action not in ["fold", "call", "raise", "all_in", "pot_committed"]:
         p_action = None
 
@@ -137,53 +253,79 @@ class GameInstance:
 
     return p_action, p_bet
 
+  # `action` is an Action or its name ("fold", "call", ...)
   def execute_player_action(self, player, action, bet_amount):
+    try:
+      action = Action.parse(action)
+    except ValueError:
+      return False
+    blind = action == Action.BLIND
     min_required_bet = self.get_min_required_bet(player)
-    print(f"min_required_bet = {min_required_bet}")
+    log.debug("Player %s: %s %s, min_required_bet = %s", player.id, action, bet_amount, min_required_bet)
 
-    if action == "fold":
+    if action == Action.FOLD:
       bet_amount = 0
 
-    elif action == "all_in":
+    elif action == Action.ALL_IN:
       bet_amount = player.chips
 
-    elif action == "call":
+    elif action == Action.CALL:
       bet_amount = min(min_required_bet, player.chips)
       if bet_amount >= player.chips:
-        action = "all_in"
+        action = Action.ALL_IN
         bet_amount = player.chips
       elif bet_amount < min_required_bet:
         return False
 
-    elif action == "raise":
+    elif action == Action.RAISE:
       bet_amount = min_required_bet + bet_amount
       if bet_amount == player.chips:
-        action = "all_in"
+        action = Action.ALL_IN
       elif bet_amount == min_required_bet:
-        action = "call"
+        action = Action.CALL
       elif bet_amount > player.chips:
         return False
       elif bet_amount < min_required_bet:
         return False
     
-    elif action == "blind":
+    elif action == Action.BLIND:
       if bet_amount == player.chips:
-        action = "all_in"
+        action = Action.ALL_IN
       else:
-        action = "wait"
+        action = Action.WAIT
     
     else:
       return False
 
+    self.tally_player(player, -1)
+    was_in = not player.last_action & Action.NOT_IN
     player.last_action = action
     self.tmp_pot.add_to_pot(player.id, bet_amount)
+    self.pot_round += bet_amount
+    self.pot_game += bet_amount
+    self.committed[player.id] += bet_amount
     player.chips -= bet_amount
     player.curr_bet = self.tmp_pot.bets[player.id]
+    raised = player.curr_bet > self.highest_bet
+    if raised:
+      # a raise, nobody else has matched the new bet yet
+      self.highest_bet = player.curr_bet
+      self.n_matched = 0
+    if not blind:
+      self.opponent_stats.record_action(player.id, action, bet_amount, raised, min_required_bet,
+                                        self.round == self.GameRound.PREFLOP)
+      self.update_seat_rates(player.id, action == Action.FOLD)
+    self.tally_player(player, 1)
+    if not player.can_do_action():
+      self.leave_ring(player.id)
+    self.update_seat_observation(player)
+    if was_in and action & Action.NOT_IN:
+      self.leave_dealer_count(player.id)
 
     return True
 
   def is_awaiting_preflop(self):
-    return self.round == self.GameRound.PREFLOP and self.tmp_pot.sum_bets() == 0
+    return self.round == self.GameRound.PREFLOP and self.pot_round == 0
 
   # Initiate the next game step
   # E.g. start round, reveal community card, next player move, etc.
@@ -193,23 +335,23 @@ class GameInstance:
       Returns: GameState -- next game state value after step method is completed
       '''
       if not self.game_active or self.round == self.GameRound.END:
-        print("Error: Cannot step to next game move because game is not in progress.")
+        log.error("Cannot step to next game move because game is not in progress.")
         return GameState.ERROR_STATE
 
       # Detect start of game: round == preflop, pot == 0
       if self.is_awaiting_preflop():
-        print("(GameInstance) Applying small and big blinds")
+        log.debug("Applying small and big blinds")
         # if there are only 2 players, player with dealer chip is also small blind
         # otherwise small blind is the player after the dealer chip
-        if len(self.players_that_can_do_action()) > 2:
+        if self.n_can_act > 2:
           self.increment_curr_pos()
 
         p_sm = self.players[self.curr_pos]
-        self.execute_player_action(p_sm, "blind", min(p_sm.chips, GameInstance.SMALL_BLIND))
+        self.execute_player_action(p_sm, Action.BLIND, min(p_sm.chips, GameInstance.SMALL_BLIND))
         self.increment_curr_pos()
 
         p_b = self.players[self.curr_pos]
-        self.execute_player_action(p_b, "blind", min(p_b.chips, GameInstance.BIG_BLIND))
+        self.execute_player_action(p_b, Action.BLIND, min(p_b.chips, GameInstance.BIG_BLIND))
         game_over = True
         for player in self.players:
           if player.chips > 0:
@@ -231,13 +373,13 @@ class GameInstance:
 
         valid_bet = self.execute_player_action(curr_player, p_action, p_bet)
         if not valid_bet:
-          print("Error: Bet amount was not valid")
+          log.warning("Bet amount was not valid (player %s: %s %s)", curr_player.id, p_action, p_bet)
           return GameState.ERROR_STATE
 
 
       # Check and handle if the round shound be over
       if self.is_round_over():
-        print("end of round")
+        log.debug("End of round")
         next_game_state = self.end_round()
         return next_game_state
 
@@ -245,39 +387,23 @@ class GameInstance:
       else:
         self.increment_curr_pos()
 
-      print("Reached end of step() method and no GameState value returned. Assuming betting continues for this round.")
+      log.debug("Betting continues this round, next player %s", self.curr_pos)
       return GameState.UNCHANGED_STATE
 
   # OR n-1 players are either "out" or "fold", one person wins
   def is_round_over(self):
     # check if only one player is not out
-    out_cnt = 0
-    for p in self.players:
-      if p.last_action in ["pending_out", "out", "fold", "pot_committed"]:
-        out_cnt += 1
-    if out_cnt == len(self.players) - 1:
+    if self.n_gone + self.n_committed == len(self.players) - 1:
       return True
 
     # check if everyone has placed the minimum required bet and is not out
-    highest_bet = self.tmp_pot.highest_bet()
-    cnt = 0
-    for p in self.players:
-      if p.last_action == "wait":
-        return False
-      if not p.can_do_action() or (p.curr_bet == highest_bet and p.can_do_action()):
-        cnt += 1
-    # print(f"round over: {cnt == len(self.players)}")
-    return cnt == len(self.players)
+    if self.n_wait > 0:
+      return False
+    return self.n_matched == self.n_can_act
 
   # If a round begins where only one player has the ability place a bet, the game should end
   def should_round_begin(self):
-    cnt = 0
-    for p in self.players:
-      if p.last_action == "wait":
-        cnt += 1
-      if cnt > 1:
-        return True
-    return False
+    return self.n_wait > 1
 
   # update board when a round is over
   # NOTE: this is NOT the end of the game, only the end of the current betting round
@@ -286,34 +412,38 @@ class GameInstance:
     while round_is_over:
       # default all players action to wait at start of round
       for player in self.players:
-        if player.last_action == "all_in":
-          player.last_action = "pot_committed"
+        if player.last_action == Action.ALL_IN:
+          player.last_action = Action.POT_COMMITTED
 
-        if player.last_action != "pending_out" and player.last_action != "out" and player.last_action != "pot_committed" and player.last_action != "fold":
-          player.last_action = "wait"
+        if not player.last_action & Action.NOT_IN:
+          player.last_action = Action.WAIT
           player.curr_bet = 0
 
       if self.round == self.GameRound.PREFLOP:
-        print("Flop")
+        log.debug("Flop")
         self.round = self.GameRound.FLOP
       elif self.round == self.GameRound.FLOP:
-        print("Turn")
+        log.debug("Turn")
         self.round = self.GameRound.TURN
       elif self.round == self.GameRound.TURN:
-        print("River")
+        log.debug("River")
         self.round = self.GameRound.RIVER
       elif self.round == self.GameRound.RIVER:
-        print("End")
+        log.debug("End")
         self.round = self.GameRound.END
         return GameState.SCAN_PLAYER_HAND # End of game, next GameState should be scanning player cards
 
       # this `else` shouldn't be reached unless there is an error with the self.round field
       else:
-        print(f"Error: could not proceed to next round from GameRound='{self.round}'")
+        log.error("Could not proceed to next round from GameRound='%s'", self.round)
         return GameState.ERROR_STATE
 
       # split out sidepots
       self.side_pots += self.tmp_pot.to_sidepots()
+      self.pot_round = 0
+      self.recount()
+      self.opponent_stats.start_round(self.contesting_players(), self.round == self.GameRound.FLOP)
+      self.reset_observations()
       # curr_pot.to_sidepots() naturally returns player bets to 0
       round_is_over = self.is_round_over()
 
@@ -333,7 +463,7 @@ class GameInstance:
     elif self.round == self.GameRound.END:
       return GameState.SCAN_PLAYER_HAND
     
-    print("Reached end of end_round() method and no GameState is returned. There may be a bug.")
+    log.error("Reached end of end_round() method and no GameState is returned. There may be a bug.")
     return GameState.ERROR_STATE
 
 
@@ -343,9 +473,16 @@ class GameInstance:
   def end_game(self):
     # split into pots one last time
     self.side_pots += self.tmp_pot.to_sidepots()
+    self.pot_round = 0
 
     # rank and calculate winnings for players based on cards
-    rankings, winnings = CardRanker.rank_and_calculate_winnings(self.players, self.community_cards, self.side_pots)
+    trackers = {}
+    for p in self.players:
+      if not p.last_action & Action.GONE:
+        trackers[p.id] = self.get_hand_tracker(p)
+    rankings, winnings = CardRanker.rank_and_calculate_winnings(self.players, self.community_cards, self.side_pots, trackers)
+
+    self.opponent_stats.record_showdown(self.contesting_players())
 
     # distribute winnings
     for player in self.players:
@@ -356,15 +493,15 @@ class GameInstance:
         player.won_last = False
 
     # show off winning amounts
-    print("WINNINGS:")
-    print(winnings)
+    log.info("Winnings: %s", winnings)
 
     # for each player with no chips, set player.last_action to "out"
     for p in self.players:
-      if p.chips == 0 and p.last_action != "out":
-        p.last_action = "pending_out"
-        print(f"Player Out: {p.name}")
+      if p.chips == 0 and p.last_action != Action.OUT:
+        p.last_action = Action.PENDING_OUT
+        log.info("Player out: %s", p.name)
     self.game_active = False
+    self.recount()
 
     return rankings, winnings
 
@@ -376,16 +513,142 @@ class GameInstance:
         res.append(player)
     return res
 
-  def get_total_pot_value(self):
-    # current round pot value
-    pot_round_value = self.tmp_pot.sum_bets()
+  # players still contesting the pot, [] if only one is left (it takes the pot without a showdown)
+  def contesting_players(self):
+    if len(self.players) - self.n_gone < 2:
+      return []
+    return [player for player in self.players if not player.last_action & Action.GONE]
 
-    # total game pot value
-    pot_game_value = pot_round_value
-    for pot in self.side_pots:
-      pot_game_value += pot.sum_bets()
+  def get_total_pot_value(self):
+    return self.pot_game
+
+  # players who can still bet this game
+  def count_players_in(self):
+    return len(self.players) - self.n_gone - self.n_committed
+
+  # opponents still contesting the pot, including all in players
+  def count_opponents(self, pos):
+    n_contesting = len(self.players) - self.n_gone
+    if self.players[pos].last_action & Action.GONE:
+      return n_contesting
+    return n_contesting - 1
+
+  # calculate the no. of players `pos` is after the dealer
+  def get_pos_from_dealer(self, pos):
+    return self.observations[pos].pos_from_dealer
+
+  # The parts of the observations that don't change from one turn to the next are kept up to date as the
+  # game goes instead of being worked out on every get_observation: each seat's chips, bets, raised flag
+  # and position from the dealer, and the OpponentStats rates of every seat with their sum over the seats
+  # contesting the pot. They are rebuilt here when a game or betting round starts (restore rebuilds the
+  # seat fields, the rates are part of the snapshot), then execute_player_action updates the acting
+  # seat (and the positions behind a seat that folds)
+  def reset_observations(self):
+    self.reset_seat_observations()
+    self.reset_rates()
+
+  def reset_seat_observations(self):
+    n_players = len(self.players)
+    in_before = 0 # players still in between the dealer and the seat
+    for i in range(n_players):
+      pos = (self.dealer_pos + i) % n_players
+      player = self.players[pos]
+      self.observations[pos].pos_from_dealer = in_before
+      if not player.last_action & Action.NOT_IN:
+        in_before += 1
+      self.update_seat_observation(player)
+
+  def reset_rates(self):
+    self.seat_rates = [self.opponent_stats.rates(seat) for seat in range(len(self.players))]
+    sums = [0.0] * len(OpponentStats.RATES)
+    for player in self.players:
+      if not player.last_action & Action.GONE:
+        for i, rate in enumerate(self.seat_rates[player.id]):
+          sums[i] += rate
+    self.contesting_rates = sums
+
+  def update_seat_observation(self, player):
+    obs = self.observations[player.id]
+    obs.chips = player.chips
+    obs.curr_bet = player.curr_bet
+    obs.total_bets = self.committed[player.id] - self.tmp_pot.bets[player.id]
+    obs.raised = player.last_action == Action.RAISE
+
+  # the seat at `pos` stopped betting, the seats after it (up to the dealer) have one player less in front
+  def leave_dealer_count(self, pos):
+    n_players = len(self.players)
+    for i in range((pos - self.dealer_pos) % n_players + 1, n_players):
+      self.observations[(self.dealer_pos + i) % n_players].pos_from_dealer -= 1
+
+  # the seat's stats changed after its action, `folded` takes it out of the contesting sum
+  def update_seat_rates(self, seat, folded):
+    old = self.seat_rates[seat]
+    new = self.opponent_stats.rates(seat)
+    self.seat_rates[seat] = new
+    sums = self.contesting_rates
+    for i in range(len(sums)):
+      sums[i] += -old[i] if folded else new[i] - old[i]
+
+  # equity of the player at `pos` (None if AI_EQUITY_SAMPLES is 0)
+  def get_equity(self, pos, n_opponents):
+    if GameInstance.AI_EQUITY_SAMPLES <= 0:
+      return None
+    return Equity.estimate(self.players[pos].cards, self.community_cards, n_opponents,
+                           samples=GameInstance.AI_EQUITY_SAMPLES,
+                           time_limit=GameInstance.AI_EQUITY_TIME_LIMIT).equity
+
+  # board cards known on each street the showdown equity is shown for
+  SHOWDOWN_STREETS = (("flop", 3), ("turn", 4))
+
+  # Exact equity the hands at the showdown had on the flop and on the turn, as
+  # [(street, {player id: EquityResult})]. Every hole card is known once the hands are scanned, so
+  # Equity.exact_showdown counts every runout with no sampling. Call it before end_game (it needs the
+  # players still contesting); [] if there is no showdown or a card is missing
+  def showdown_equity(self):
+    players = self.contesting_players()
+    hands = [p.cards for p in players]
+    if not players or Card.NA in self.community_cards or any(Card.NA in hand for hand in hands):
+      return []
+    res = []
+    for street, n_board in GameInstance.SHOWDOWN_STREETS:
+      results = Equity.exact_showdown(hands, self.community_cards[:n_board])
+      res.append((street, {p.id : result for p, result in zip(players, results)}))
+    return res
 
-    return pot_game_value
+  # Fill and return the Observation of the player at `pos` (the current player by default).
+  # Same information as get_state_ai, read from the running pot totals instead of summing the pots.
+  # The Observation is reused, so the next call for that seat overwrites it (use .copy() to keep one)
+  def get_observation(self, pos=None):
+    if pos is None:
+      pos = self.curr_pos
+    player = self.players[pos]
+    n_opponents = self.count_opponents(pos)
+    equity = self.get_equity(pos, n_opponents)
+
+    # chips, bets, raised and pos_from_dealer are already up to date, see reset_observations
+    obs = self.observations[pos]
+    obs.round = self.round.value
+    obs.hand_strength = self.get_hand_tracker(player).score()
+    obs.equity = float("nan") if equity is None else equity
+    obs.min_req_bet = self.get_min_required_bet(player)
+    obs.pot_round = self.pot_round
+    obs.pot_game = self.pot_game
+    obs.players_in = self.count_players_in()
+    obs.n_opponents = n_opponents
+    obs.opp_vpip, obs.opp_aggression, obs.opp_fold_to_raise, obs.opp_showdown = self.get_opponent_rates(pos)
+    return obs
+
+  # OpponentStats rates averaged over the opponents of `pos` still contesting the pot,
+  # from the running sum over the contesting seats (see reset_observations)
+  def get_opponent_rates(self, pos):
+    n = len(self.players) - self.n_gone
+    sums = self.contesting_rates
+    if not self.players[pos].last_action & Action.GONE:
+      n -= 1
+      sums = [total - own for total, own in zip(sums, self.seat_rates[pos])]
+    if n <= 0:
+      return OpponentStats.PRIOR[:]
+    return [total / n for total in sums]
 
   def get_state_ai(self, pos=None):
     '''
@@ -398,57 +661,40 @@ class GameInstance:
     - ai's cards
     - ai's last action
     - ai's current bet amount
+    - ai's equity (expected pot share against the opponents still in the hand)
+    - opponents' playing statistics (see OpponentStats), each and averaged over those still in the hand
     '''
-    print("Generating a json object for the AI model at curr_pos")
     if pos == None:
       pos = self.curr_pos
 
     river_state = self.round.name
-
-    # current round pot value
-    pot_round_value = self.tmp_pot.sum_bets()
-
-    # total game pot value
-    pot_game_value = pot_round_value
-    for pot in self.side_pots:
-      pot_game_value += pot.sum_bets()
-
-    ai_total_bets = 0
-    for pot in self.side_pots:
-      if pos in pot.bets:
-        ai_total_bets += pot.bets[pos]
+    pot_round_value = self.pot_round
+    pot_game_value = self.pot_game
+    ai_total_bets = self.committed[pos] - self.tmp_pot.bets[pos] # chips in earlier rounds' pots
 
     community_cards = self.community_cards
     ai_instance = self.players[pos]
     ai_cards = ai_instance.cards
-    ai_hand_strength = CardRanker.find_best_hand(ai_cards, community_cards)[0]
-    ai_last_action = ai_instance.last_action
+    ai_hand_strength = self.get_hand_tracker(ai_instance).score()
+    ai_last_action = ai_instance.last_action.label
     ai_curr_bet = ai_instance.curr_bet
     ai_chips = ai_instance.chips
     min_req_bet = self.get_min_required_bet()
 
-    players_in = 0
-    for player in self.players:
-      if player.last_action not in ["pending_out", "out", "fold", "pot_committed"]:
-        players_in += 1
-
-    # calculate the no. of players ai is after the dealer
-    pos_from_dealer = 0
-    pos_index = self.dealer_pos
-    while pos_index != pos:
-      if self.players[pos_index].last_action not in ["pending_out", "out", "fold", "pot_committed"]:
-        pos_from_dealer += 1
-      pos_index += 1
-      if pos_index == len(self.players):
-        pos_index = 0
+    n_opponents = self.count_opponents(pos)
+    ai_equity = self.get_equity(pos, n_opponents)
+    players_in = self.count_players_in()
+    pos_from_dealer = self.get_pos_from_dealer(pos)
+    opp_vpip, opp_aggression, opp_fold_to_raise, opp_showdown = self.get_opponent_rates(pos)
     # opponents must be NOT 'out' and NOT be the current ai player
     opponents_data = []
     for opponent in self.players:
-      if opponent.id != pos and opponent.last_action != 'out':
+      if opponent.id != pos and opponent.last_action != Action.OUT:
         opponent_obj = {
-          "last_action" : opponent.last_action,
+          "last_action" : opponent.last_action.label,
           "curr_bet" : opponent.curr_bet,
-          "chips" : opponent.chips
+          "chips" : opponent.chips,
+          "stats" : self.opponent_stats.seat_rates(opponent.id)
         }
         opponents_data.append(opponent_obj)
 
@@ -459,6 +705,8 @@ class GameInstance:
       "community_cards" : community_cards,
       "ai_cards" : ai_cards,
       "ai_hand_strength" : ai_hand_strength,
+      "ai_equity" : ai_equity,
+      "n_opponents" : n_opponents,
       "ai_last_action" : ai_last_action,
       "ai_curr_bet" : ai_curr_bet,
       "ai_total_bets" : ai_total_bets,
@@ -466,11 +714,100 @@ class GameInstance:
       "min_req_bet" : min_req_bet,
       "players_in" : players_in,
       "pos_from_dealer" : pos_from_dealer,
+      "opp_vpip" : opp_vpip,
+      "opp_aggression" : opp_aggression,
+      "opp_fold_to_raise" : opp_fold_to_raise,
+      "opp_showdown" : opp_showdown,
       "opponents" : opponents_data
     }
 
+    log.debug("AI state for player %s: %s", pos, res_dict)
     return res_dict
 
+  # Snapshot of the whole game as one flat tuple of ints, enums and tuples, for search based AIs that
+  # try moves out and go back (copy.deepcopy of the objects is far too slow for that).
+  #   snap = game.snapshot()
+  #   game.step("raise", 50) ...
+  #   game.restore(snap)
+  # A snapshot can be restored any number of times, into this game or another GameInstance with the
+  # same players. The opponent statistics are part of it, so trying moves out doesn't count them as
+  # played. Hand trackers aren't saved, they are rebuilt the first time they're needed.
+  def snapshot(self):
+    players = []
+    for p in self.players:
+      players += [p.chips, p.last_action, p.curr_bet, None if p.cards is None else tuple(p.cards), p.won_last]
+
+    started = hasattr(self, "tmp_pot")
+    return (
+      self.game_active, self.dealer_pos, self.curr_pos, self.round,
+      tuple(self.community_cards) if started else None,
+      tuple(self.deck.cards) if started else None,
+      tuple(self.tmp_pot.bets.items()) if started else None,
+      tuple(tuple(pot.bets.items()) for pot in self.side_pots) if started else None,
+      self.pot_round if started else 0,
+      self.pot_game if started else 0,
+      tuple(self.committed.items()) if started else None,
+      self.highest_bet, self.n_gone, self.n_committed, self.n_wait, self.n_can_act, self.n_matched,
+      tuple(self.in_ring), tuple(self.ring_next), tuple(self.ring_prev),
+      self.opponent_stats.snapshot(), tuple(map(tuple, self.seat_rates)), tuple(self.contesting_rates),
+      tuple(players)
+    )
+
+  def restore(self, snapshot):
+    (self.game_active, self.dealer_pos, self.curr_pos, self.round,
+     community_cards, deck_cards, tmp_bets, side_pots, self.pot_round, self.pot_game, committed,
+     self.highest_bet, self.n_gone, self.n_committed, self.n_wait, self.n_can_act, self.n_matched,
+     in_ring, ring_next, ring_prev, opponent_stats, seat_rates, contesting_rates, players) = snapshot
+
+    if community_cards is not None:
+      self.community_cards = list(community_cards)
+      if not hasattr(self, "deck"):
+        self.deck = Deck(self.deck_rng)
+      self.deck.cards = list(deck_cards)
+      if not hasattr(self, "tmp_pot"):
+        self.tmp_pot = TempPot(self.players)
+      self.tmp_pot.bets = dict(tmp_bets)
+      self.side_pots = [Pot(dict(bets)) for bets in side_pots]
+      self.committed = dict(committed)
+    self.in_ring = list(in_ring)
+    self.ring_next = list(ring_next)
+    self.ring_prev = list(ring_prev)
+    self.opponent_stats.restore(opponent_stats)
+    self.seat_rates = [list(rates) for rates in seat_rates]
+    self.contesting_rates = list(contesting_rates)
+    self.hand_trackers = {}
+
+    for i, p in enumerate(self.players):
+      p.chips, p.last_action, p.curr_bet, cards, p.won_last = players[5 * i : 5 * i + 5]
+      p.cards = None if cards is None else list(cards)
+    if community_cards is not None:
+      self.reset_seat_observations()
+
+  # games pickled before cards were ints hold card strings
+  def __setstate__(self, state):
+    if "community_cards" in state:
+      state["community_cards"] = Card.from_saved(state["community_cards"])
+    state.setdefault("hand_trackers", {})
+    state.setdefault("deck_rng", None)
+    self.__dict__.update(state)
+    if "opponent_stats" not in state:
+      self.opponent_stats = OpponentStats(len(self.players))
+    if "ring_next" not in state:
+      self.recount()
+
+    if "observations" not in state:
+      self.observations = [Observation() for _ in self.players]
+      if "tmp_pot" in state:
+        self.pot_round = self.tmp_pot.sum_bets()
+        self.pot_game = self.pot_round + sum(pot.sum_bets() for pot in self.side_pots)
+        self.committed = {player.id : self.tmp_pot.bets.get(player.id, 0) + sum(pot.bets.get(player.id, 0) for pot in self.side_pots)
+                          for player in self.players}
+    if "contesting_rates" not in state:
+      self.seat_rates = [OpponentStats.PRIOR] * len(self.players)
+      self.contesting_rates = [0.0] * len(OpponentStats.RATES)
+      if "tmp_pot" in state:
+        self.reset_observations()
+
   def divider(s):
     return "\n-------------------- " + s + " --------------------\n\n"
 
@@ -481,14 +818,14 @@ class GameInstance:
 
     res += GameInstance.divider("General State")
     res += f"Round: {self.round}\n"
-    res += f"Community Cards: {self.community_cards}\n"
+    res += f"Community Cards: {Card.to_strs(self.community_cards)}\n"
     res += f"Dealer Position: {self.dealer_pos}\n"
     res += f"Current Position: {self.curr_pos}\n"
     res += f"Current Player: {self.players[self.curr_pos].name}\n"
 
     res += GameInstance.divider(f"Players ({len(self.players)})")
     for player in self.players:
-      res += f"ID{player.id}, chips:{player.chips}, cards:{player.cards}, last_action:{player.last_action}\n"
+      res += f"ID{player.id}, chips:{player.chips}, cards:{Card.to_strs(player.cards)}, last_action:{player.last_action.label}\n"
 
     res += GameInstance.divider("Current Pot")
     for key, value in self.tmp_pot.bets.items():
@@ -0,0 +1,209 @@
+import itertools
+from game_logic.card import Card
+
+# Lookup table hand evaluator
+# Scores up to 7 cards with a handful of table lookups instead of building every 5-card
+# combination. Scores are the exact integers `CardRanker.compile_score` produces, so
+# hands rank in the same order and the AI's hand strength feature keeps the same scale.
+class HandEvaluator:
+
+  # each card adds 5^rank to the rank key, which stays unique for up to 4 cards of a rank.
+  # The extra entry is Card.NA, which adds nothing to a hand
+  RANK_KEY = [5 ** (c >> 2) for c in range(52)] + [0]
+  RANK_BIT = [1 << (c >> 2) for c in range(52)] + [0]
+
+  # same values as CardRanker.CARD_SCORE, indexed by rank_index
+  RANK_VALUE = [r + 12 for r in range(13)]
+
+  # compile_score reads the single digit of an ace-low straight ([5, 5] -> "55") as 50
+  WHEEL_VALUE = 50
+  WHEEL_MASK = 0b1000000001111
+
+  HAND_LABELS = {
+    9 : "Straight Flush",
+    8 : "Four-of-a-Kind",
+    7 : "Full House",
+    6 : "Flush",
+    5 : "Straight",
+    4 : "Three-of-a-Kind",
+    3 : "Two Pair",
+    2 : "One Pair",
+    1 : "High Card",
+  }
+
+  # filled in by build_tables() the first time a hand is scored (about a second of work)
+  FLUSH_TABLE = None # 13-bit suit rank mask -> score, 0 if the mask has fewer than 5 cards
+  RANK_TABLE = None  # sum of RANK_KEY -> score of the best non-flush hand
+
+  # Score a hand of up to 7 cards.
+  # Card.NA entries are skipped and the missing kickers are scored as 0
+  @staticmethod
+  def evaluate(cards):
+    key = 0
+    suit_masks = [0, 0, 0, 0]
+    for c in cards:
+      key += HandEvaluator.RANK_KEY[c]
+      suit_masks[c & 3] |= HandEvaluator.RANK_BIT[c]
+    return HandEvaluator.lookup(key, suit_masks)
+
+  # Score from a summed RANK_KEY and the RANK_BIT masks of each suit
+  @staticmethod
+  def lookup(key, suit_masks):
+    if HandEvaluator.RANK_TABLE is None:
+      HandEvaluator.build_tables()
+
+    # 5 cards of one suit out of 7 rule out quads and full houses, so a flush is final
+    for mask in suit_masks:
+      score = HandEvaluator.FLUSH_TABLE[mask]
+      if score:
+        return score
+    return HandEvaluator.RANK_TABLE[key]
+
+  # Equivalent of CardRanker.find_best_hand: [score, hand label, 5 best cards sorted low to high]
+  @staticmethod
+  def find_best_hand(cards):
+    score = HandEvaluator.evaluate(cards)
+    return [score, HandEvaluator.label(score), HandEvaluator.best_cards(cards, score)]
+
+  @staticmethod
+  def label(score):
+    return HandEvaluator.HAND_LABELS[score // 10**12]
+
+  # Split a score back into its hand class and the 5 card values of compile_score
+  @staticmethod
+  def decode(score):
+    values = [(score // 10**(10 - 2*i)) % 100 for i in range(5)]
+    return score // 10**12, values
+
+  # Rebuild which cards make up the hand a score was given for.
+  # The first matching cards are used, which is also what CardRanker picked.
+  @staticmethod
+  def best_cards(cards, score):
+    hand_class, values = HandEvaluator.decode(score)
+    cards = [c for c in cards if c != Card.NA]
+
+    if hand_class in [9, 6]:
+      suit_masks = [0, 0, 0, 0]
+      for c in cards:
+        suit_masks[c & 3] |= HandEvaluator.RANK_BIT[c]
+      suit = next(s for s in range(4) if bin(suit_masks[s]).count("1") >= 5)
+      cards = [c for c in cards if c & 3 == suit]
+
+    if hand_class == 8:
+      values = [values[0]] * 4 + [values[1]]
+    elif hand_class == 7:
+      values = [values[0]] * 3 + [values[1]] * 2
+    elif hand_class == 4:
+      values = [values[0]] * 3 + values[1:3]
+    elif hand_class == 3:
+      values = [values[0]] * 2 + [values[1]] * 2 + [values[2]]
+    elif hand_class == 2:
+      values = [values[0]] * 2 + values[1:4]
+
+    if hand_class in [9, 5] and values[0] == HandEvaluator.WHEEL_VALUE:
+      values = [24, 15, 14, 13, 12]
+    elif hand_class == 5:
+      values = [values[0] - i for i in range(5)]
+
+    used = []
+    remaining = cards[:]
+    for value in values:
+      card = next((c for c in remaining if HandEvaluator.RANK_VALUE[c >> 2] == value), None)
+      if card is None:
+        continue
+      remaining.remove(card)
+      used.append(card)
+    used.sort(key=lambda c: c >> 2)
+
+    return [Card.NA for _ in range(5 - len(used))] + used
+
+  # Convert a hand class and card values into the compile_score integer
+  # E.g. (2, [14, 13, 15, 12]) -> 2141315120000
+  @staticmethod
+  def compile_score(hand_class, values):
+    score = hand_class * 10**12
+    for i, value in enumerate(values):
+      score += value * 10**(10 - 2*i)
+    return score
+
+  # Value of the best straight in a 13-bit rank mask, 0 if there is none
+  @staticmethod
+  def straight_value(mask):
+    if mask & HandEvaluator.WHEEL_MASK == HandEvaluator.WHEEL_MASK:
+      return HandEvaluator.WHEEL_VALUE
+    for high in range(12, 3, -1):
+      if (mask >> (high - 4)) & 0b11111 == 0b11111:
+        return HandEvaluator.RANK_VALUE[high]
+    return 0
+
+  # Best non-flush score for a list of 13 rank counts
+  @staticmethod
+  def score_rank_counts(counts):
+    ranks = [r for r in range(12, -1, -1) if counts[r] > 0]
+    quads = [r for r in ranks if counts[r] == 4]
+    trips = [r for r in ranks if counts[r] == 3]
+    pairs = [r for r in ranks if counts[r] == 2]
+    value = HandEvaluator.RANK_VALUE
+
+    if quads:
+      kickers = [value[r] for r in ranks if r != quads[0]]
+      return HandEvaluator.compile_score(8, [value[quads[0]]] + kickers[:1])
+
+    if trips and len(trips) + len(pairs) >= 2:
+      pair = max([r for r in trips[1:]] + pairs)
+      return HandEvaluator.compile_score(7, [value[trips[0]], value[pair]])
+
+    mask = 0
+    for r in ranks:
+      mask |= 1 << r
+    straight = HandEvaluator.straight_value(mask)
+    if straight:
+      return HandEvaluator.compile_score(5, [straight])
+
+    if trips:
+      kickers = [value[r] for r in ranks if r != trips[0]]
+      return HandEvaluator.compile_score(4, [value[trips[0]]] + kickers[:2])
+
+    if len(pairs) >= 2:
+      kickers = [value[r] for r in ranks if r not in pairs[:2]]
+      return HandEvaluator.compile_score(3, [value[pairs[0]], value[pairs[1]]] + kickers[:1])
+
+    if pairs:
+      kickers = [value[r] for r in ranks if r != pairs[0]]
+      return HandEvaluator.compile_score(2, [value[pairs[0]]] + kickers[:3])
+
+    return HandEvaluator.compile_score(1, [value[r] for r in ranks[:5]])
+
+  # Best flush or straight flush score for the ranks of a single suit
+  @staticmethod
+  def score_flush_mask(mask):
+    straight = HandEvaluator.straight_value(mask)
+    if straight == HandEvaluator.WHEEL_VALUE:
+      return HandEvaluator.compile_score(9, [straight])
+    if straight:
+      return HandEvaluator.compile_score(9, [straight - i for i in range(5)])
+
+    values = [HandEvaluator.RANK_VALUE[r] for r in range(12, -1, -1) if mask & (1 << r)]
+    return HandEvaluator.compile_score(6, values[:5])
+
+  @staticmethod
+  def build_tables():
+    flush_table = [0] * (1 << 13)
+    for mask in range(1 << 13):
+      if bin(mask).count("1") >= 5:
+        flush_table[mask] = HandEvaluator.score_flush_mask(mask)
+
+    # every multiset of up to 7 ranks with at most 4 cards of each rank
+    rank_table = {}
+    for n_cards in range(8):
+      for ranks in itertools.combinations_with_replacement(range(13), n_cards):
+        counts = [0] * 13
+        for r in ranks:
+          counts[r] += 1
+        if max(counts, default=0) > 4:
+          continue
+        key = sum(5 ** r for r in ranks)
+        rank_table[key] = HandEvaluator.score_rank_counts(counts)
+
+    HandEvaluator.FLUSH_TABLE = flush_table
+    HandEvaluator.RANK_TABLE = rank_table
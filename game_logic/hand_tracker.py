@@ -0,0 +1,38 @@
+from game_logic.card import Card
+from game_logic.hand_evaluator import HandEvaluator
+
+# Hand of one player during one game, kept up to date street by street.
+# The hole cards are fixed and the board only grows, so each new community card just adds to
+# the rank key and suit masks HandEvaluator scores from. The score is computed on the first
+# read after a change and cached until the next card arrives.
+class HandTracker:
+  def __init__(self, hole_cards, community_cards):
+    self.hole_cards = list(hole_cards)
+    self.cards = []
+    self.rank_key = 0
+    self.suit_masks = [0, 0, 0, 0]
+    self._score = None
+    self._best_hand = None
+    for card in self.hole_cards + community_cards:
+      self.add_card(card)
+
+  def add_card(self, card):
+    if card == Card.NA:
+      return
+    self.cards.append(card)
+    self.rank_key += HandEvaluator.RANK_KEY[card]
+    self.suit_masks[card & 3] |= HandEvaluator.RANK_BIT[card]
+    self._score = None
+    self._best_hand = None
+
+  def score(self):
+    if self._score is None:
+      self._score = HandEvaluator.lookup(self.rank_key, self.suit_masks)
+    return self._score
+
+  # same as CardRanker.find_best_hand: [score, hand label, 5 best cards sorted low to high]
+  def best_hand(self):
+    if self._best_hand is None:
+      score = self.score()
+      self._best_hand = [score, HandEvaluator.label(score), HandEvaluator.best_cards(self.cards, score)]
+    return self._best_hand
@@ -0,0 +1,47 @@
+import logging
+
+# Logging for game_logic and local_ml.
+# Each module logs to `logging.getLogger(__name__)` (e.g. "game_logic.game") with %-style arguments,
+# so a message is only formatted if it is actually written. By default only warnings and errors are
+# shown; the per-action DEBUG/INFO messages cost a single level check. Levels are switched per module
+# or package from the command line with --log, e.g.
+#   python main.py --log debug                                  everything
+#   python main.py --log game_logic.game=debug local_ml=info    only some modules
+#   python -m game_logic.simulator --log off                    not even warnings
+class Logs:
+  PACKAGES = ["game_logic", "local_ml"]
+  FORMAT = "%(relativeCreated)9.1fms %(levelname)-7s %(name)s: %(message)s"
+  OFF = logging.CRITICAL + 1
+
+  handler = None
+
+  # "debug" -> logging.DEBUG, "off" -> Logs.OFF
+  @staticmethod
+  def level(name):
+    if name.lower() == "off":
+      return Logs.OFF
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):
+      raise ValueError(f"Unknown log level '{name}'")
+    return level
+
+  # Apply specs of the form "LEVEL" (all of game_logic and local_ml) or "module=LEVEL"
+  @staticmethod
+  def configure(specs):
+    if Logs.handler is None:
+      Logs.handler = logging.StreamHandler()
+      Logs.handler.setFormatter(logging.Formatter(Logs.FORMAT))
+      for package in Logs.PACKAGES:
+        logger = logging.getLogger(package)
+        logger.addHandler(Logs.handler)
+        logger.propagate = False
+
+    for spec in specs:
+      name, _, level = spec.rpartition("=")
+      for logger_name in ([name] if name else Logs.PACKAGES):
+        logging.getLogger(logger_name).setLevel(Logs.level(level))
+
+  @staticmethod
+  def add_arguments(parser):
+    parser.add_argument("--log", nargs="+", default=[], metavar="[MODULE=]LEVEL",
+                        help="log level (debug, info, warning, error, off) for all game modules or for one module/package")
@@ -0,0 +1,243 @@
+import logging
+import math
+import random
+import time
+from game_logic.action import Action
+from game_logic.card import Card
+from game_logic.card_ranker import CardRanker
+from game_logic.game import GameInstance
+from game_logic.hand_evaluator import HandEvaluator
+from game_logic.player import Player
+from objects.gamestate import GameState
+
+log = logging.getLogger(__name__)
+
+
+# One betting state of the search tree, reached by a sequence of moves from the root.
+# Cards aren't part of a node: the unknown cards are dealt again every iteration, so a node's
+# statistics are averaged over every deal that is consistent with what the searching seat knows.
+class Node:
+  __slots__ = ["mover", "pos", "untried", "children", "visits", "reward"]
+
+  def __init__(self, mover, pos, moves):
+    self.mover = mover # seat whose move led here, `reward` is from its point of view
+    self.pos = pos # seat to act, None once the hand is over
+    self.untried = moves
+    self.children = {} # move -> Node
+    self.visits = 0
+    self.reward = 0.0
+
+
+# Monte Carlo tree search AI.
+# Every iteration restores a private copy of the game to the decision point, deals the cards the
+# searching seat can't see (opponents' hole cards and the rest of the board) at random from the
+# cards that are left, walks down the tree choosing moves with UCB1 for whichever seat is acting,
+# adds one new node and plays the rest of the hand out with `rollout_policy`. The showdown is scored
+# with the HandEvaluator lookup tables (see `showdown`), and every seat's chip result is added to the
+# nodes of its own moves. Iterations run until the time budget is used up, then the move
+# tried most often at the root is played.
+#
+#   search = MCTS(time_budget_ms=500)
+#   action, bet = search.decide(game_instance, pos)
+#
+# The game passed in is only read (through GameInstance.snapshot), so it is safe to search from a
+# thread other than the one that owns the game as long as the game doesn't change in the meantime.
+class MCTS:
+  TIME_BUDGET_MS = 500
+  EXPLORATION = 1.4 # UCB1 exploration constant, rewards are chips won as a share of the seat's stack
+
+  # raise sizes tried besides all in, as fractions of the pot after calling
+  RAISE_SIZES = [0.5, 1.0]
+
+  # community cards on the table in each round
+  BOARD_SIZE = {
+    GameInstance.GameRound.FLOP : 3,
+    GameInstance.GameRound.TURN : 4,
+    GameInstance.GameRound.RIVER : 5,
+    GameInstance.GameRound.END : 5
+  }
+
+  # rollout_policy: policy(game_instance, pos) -> (action, bet) for moves below the tree,
+  # checks and calls down to the showdown by default
+  # max_iterations: stop early after this many iterations (e.g. for repeatable tests with a seeded rng)
+  def __init__(self, time_budget_ms=None, max_iterations=None, rollout_policy=None, rng=None):
+    self.time_budget_ms = time_budget_ms or MCTS.TIME_BUDGET_MS
+    self.max_iterations = max_iterations
+    self.rollout_policy = rollout_policy or MCTS.call_policy
+    self.rng = rng or random.Random()
+
+  # Search from the seat at `pos` (the current player by default).
+  # Returns (action, bet) with the same meaning as GameInstance.step
+  def decide(self, game_instance, pos=None):
+    if pos is None:
+      pos = game_instance.curr_pos
+    root_snapshot = game_instance.snapshot()
+    root = Node(None, pos, MCTS.moves(game_instance, pos))
+    if len(root.untried) == 1:
+      action, bet = root.untried[0]
+      return action.label, bet
+
+    sim = MCTS.copy_game(game_instance)
+    hero = game_instance.players[pos]
+    hero_known = hero.cards is not None and Card.NA not in hero.cards
+    known = (hero.cards if hero_known else []) + [c for c in game_instance.community_cards if c != Card.NA]
+    unknown = [c for c in range(52) if c not in known]
+    # chips each seat had when the hand started, rewards are measured against it
+    stacks = [max(p.chips + game_instance.committed[p.id], 1) for p in game_instance.players]
+
+    start = time.perf_counter()
+    deadline = start + self.time_budget_ms / 1000
+    iterations = 0
+    while self.max_iterations is None or iterations < self.max_iterations:
+      sim.restore(root_snapshot)
+      self.determinize(sim, pos, unknown, hero_known)
+      self.iterate(sim, root, stacks)
+      iterations += 1
+      if time.perf_counter() >= deadline:
+        break
+
+    move, child = max(root.children.items(), key=lambda item: item[1].visits)
+    if log.isEnabledFor(logging.DEBUG):
+      log.debug("Seat %s: %d iterations in %.0fms, %s", pos, iterations, (time.perf_counter() - start) * 1000,
+                {f"{m[0].label} {m[1]}" : (c.visits, round(c.reward / c.visits, 3)) for m, c in root.children.items()})
+    action, bet = move
+    return action.label, bet
+
+  # One selection, expansion, rollout and backpropagation pass starting from the root state in `sim`
+  def iterate(self, sim, root, stacks):
+    chips_before = [p.chips for p in sim.players]
+    path = [root]
+    node = root
+
+    # selection: follow UCB1 while every move of the node has been tried
+    while node.pos is not None and not node.untried:
+      move, node = MCTS.select(node)
+      path.append(node)
+      MCTS.play(sim, node.mover, move)
+
+    # expansion: add one untried move
+    if node.pos is not None:
+      move = node.untried.pop(self.rng.randrange(len(node.untried)))
+      mover = node.pos
+      next_pos = MCTS.play(sim, mover, move)
+      child = Node(mover, next_pos, [] if next_pos is None else MCTS.moves(sim, next_pos))
+      node.children[move] = child
+      path.append(child)
+
+      # rollout
+      pos = next_pos
+      if pos is not None and self.rollout_policy is MCTS.call_policy:
+        MCTS.check_down(sim)
+        pos = None
+      while pos is not None:
+        action, bet = self.rollout_policy(sim, pos)
+        pos = MCTS.play(sim, pos, (action, bet))
+
+    # backpropagation
+    rewards = [(p.chips - chips_before[i]) / stacks[i] for i, p in enumerate(sim.players)]
+    root.visits += 1
+    for node in path[1:]:
+      node.visits += 1
+      node.reward += rewards[node.mover]
+
+  # (move, child) of `node` with the best UCB1 score for the seat acting there
+  @staticmethod
+  def select(node):
+    log_visits = math.log(node.visits)
+    best_score = -math.inf
+    for move, child in node.children.items():
+      score = child.reward / child.visits + MCTS.EXPLORATION * math.sqrt(log_visits / child.visits)
+      if score > best_score:
+        best_score = score
+        best_move, best_child = move, child
+    return best_move, best_child
+
+  # Deal the cards `pos` can't see: hole cards of every opponent still in the hand (and its own if they
+  # haven't been scanned), and the rest of the board as the deck. Only as many cards as will be used are drawn
+  def determinize(self, sim, pos, unknown, hero_known):
+    players = [p for p in sim.players if (p.id != pos or not hero_known) and not p.last_action & Action.GONE]
+    n_board = sim.community_cards.count(Card.NA)
+    cards = self.rng.sample(unknown, 2 * len(players) + n_board)
+    for i, player in enumerate(players):
+      player.cards = cards[2 * i : 2 * i + 2]
+    sim.deck.cards = cards[2 * len(players):]
+
+  # Make `pos`'s move and run the game on to the next decision.
+  # Returns the seat to act next, None once the hand is over (winnings have been paid out)
+  @staticmethod
+  def play(sim, pos, move):
+    action, bet = move
+    state = sim.step(action, bet)
+    while True:
+      if state == GameState.ERROR_STATE:
+        raise RuntimeError(f"MCTS: seat {pos} made an invalid move ({action}, {bet})")
+      if state != GameState.UNCHANGED_STATE:
+        MCTS.deal_board(sim)
+        if state == GameState.SCAN_PLAYER_HAND:
+          MCTS.showdown(sim)
+          return None
+      # nobody left to bet this round, step on without a move
+      if not sim.is_round_over():
+        return sim.curr_pos
+      state = sim.step()
+
+  # Pay out the pots like GameInstance.end_game, leaving out what only the play screen needs
+  # (best five cards and hand labels, won_last, logging): hands are ranked by score alone
+  @staticmethod
+  def showdown(sim):
+    sim.side_pots += sim.tmp_pot.to_sidepots()
+    hands = sorted((-HandEvaluator.evaluate(p.cards + sim.community_cards), p.id)
+                   for p in sim.players if not p.last_action & Action.GONE)
+    rankings = []
+    last_score = None
+    for score, p_id in hands:
+      if score != last_score:
+        rankings.append([])
+        last_score = score
+      rankings[-1].append([p_id, -score])
+    for p_id, chips in CardRanker.calculate_winnings(sim.players, rankings, sim.side_pots).items():
+      sim.players[p_id].chips += chips
+
+  # Where playing call_policy to the end of the hand leads, without stepping through it: everyone who can
+  # still bet calls this round's highest bet, nobody bets after that, the board is dealt and shown down
+  @staticmethod
+  def check_down(sim):
+    for player in sim.players:
+      if player.can_do_action():
+        sim.execute_player_action(player, Action.CALL, 0)
+    sim.round = GameInstance.GameRound.END
+    MCTS.deal_board(sim)
+    MCTS.showdown(sim)
+
+  @staticmethod
+  def deal_board(sim):
+    for i in range(MCTS.BOARD_SIZE.get(sim.round, 0)):
+      if sim.community_cards[i] == Card.NA:
+        sim.set_community_card(i, sim.deck.pull())
+
+  # Moves tried for the seat at `pos`: call (or check), fold when facing a bet, and raises of
+  # RAISE_SIZES of the pot and all in, each at least a big blind
+  @staticmethod
+  def moves(game_instance, pos):
+    player = game_instance.players[pos]
+    min_req_bet = game_instance.get_min_required_bet(player)
+    moves = [(Action.CALL, 0)]
+    if min_req_bet > 0:
+      moves.append((Action.FOLD, 0))
+    max_raise = player.chips - min_req_bet
+    if max_raise > 0:
+      pot = game_instance.pot_game + min_req_bet
+      sizes = {min(max(int(pot * size), GameInstance.BIG_BLIND), max_raise) for size in MCTS.RAISE_SIZES}
+      sizes.add(max_raise)
+      moves += [(Action.RAISE, size) for size in sorted(sizes)]
+    return moves
+
+  # A GameInstance of its own for the search to play in, with copies of the players
+  @staticmethod
+  def copy_game(game_instance):
+    players = [Player(p.name, p.is_ai, p.id, p.chips) for p in game_instance.players]
+    return GameInstance(players)
+
+  @staticmethod
+  def call_policy(game_instance, pos):
+    return Action.CALL, 0
@@ -0,0 +1,50 @@
+import numpy as np
+from operator import attrgetter
+
+# Fixed layout version of what GameInstance.get_state_ai reports for one seat.
+# GameInstance keeps one preallocated Observation per seat and fills it from counters it updates as
+# bets are made, so nothing is parsed or summed on the AI's turn. Agent.predict_observation reads one
+# directly; for batches, `to_array` packs many into a NumPy structured array of Observation.DTYPE.
+class Observation:
+  DTYPE = np.dtype([
+    ("round", np.int8),             # GameRound value: 0 preflop, 1 flop, 2 turn, 3 river
+    ("hand_strength", np.float64),  # HandEvaluator score of the seat's cards and the board
+    ("equity", np.float64),         # Equity.estimate against the opponents still in, NaN if not estimated
+    ("chips", np.int64),
+    ("curr_bet", np.int64),         # chips bet this betting round
+    ("total_bets", np.int64),       # chips bet in earlier betting rounds of this game
+    ("min_req_bet", np.int64),      # chips needed to call
+    ("raised", np.bool_),           # last action was a raise
+    ("pot_round", np.int64),        # chips bet by everyone this betting round
+    ("pot_game", np.int64),         # chips bet by everyone this game
+    ("players_in", np.int8),        # players who can still bet (not folded, out or all in)
+    ("n_opponents", np.int8),       # other players still contesting the pot, all in players included
+    ("pos_from_dealer", np.int8),   # players still in between the dealer and this seat
+    # OpponentStats rates averaged over the opponents still contesting the pot
+    ("opp_vpip", np.float64),
+    ("opp_aggression", np.float64),
+    ("opp_fold_to_raise", np.float64),
+    ("opp_showdown", np.float64),
+  ])
+  FIELDS = DTYPE.names
+  # obs -> tuple of every field, in DTYPE order
+  VALUES = attrgetter(*FIELDS)
+
+  __slots__ = FIELDS
+
+  def __init__(self):
+    for field in Observation.FIELDS:
+      setattr(self, field, 0)
+    self.equity = float("nan")
+    self.raised = False
+
+  def copy(self):
+    res = Observation()
+    for field in Observation.FIELDS:
+      setattr(res, field, getattr(self, field))
+    return res
+
+  # list of Observations -> structured array of Observation.DTYPE, one row each
+  @staticmethod
+  def to_array(observations):
+    return np.array(list(map(Observation.VALUES, observations)), dtype=Observation.DTYPE)
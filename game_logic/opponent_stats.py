@@ -0,0 +1,113 @@
+from game_logic.action import Action
+
+
+# Long running statistics of how each seat plays, kept across hands for the AI to read its opponents by.
+# Everything is a streaming counter in a fixed size row per seat, so recording an action is a few
+# increments whatever the number of hands played. The rows are plain lists rather than a NumPy array:
+# single element updates and the handful of seats read per decision are much cheaper on lists. GameInstance owns one and feeds it:
+# `start_hand` and `start_round` from the game flow, `record_action` from execute_player_action
+# and `record_showdown` from end_game. It is pickled with the game, so a saved game keeps them.
+#
+# Rates (see `rates`):
+#   vpip:           share of hands the seat put chips in before the flop without being forced to (blinds)
+#   aggression:     raises / (raises + calls), the aggression factor raises / calls scaled to [0, 1)
+#   fold_to_raise:  share of the times the seat faced a raise that it folded
+#   showdown:       share of the hands the seat saw the flop in that it took to a showdown
+class OpponentStats:
+  # counter columns
+  HANDS = 0
+  VPIP = 1
+  RAISES = 2
+  CALLS = 3
+  FACED_RAISE = 4
+  FOLDED_TO_RAISE = 5
+  SAW_FLOP = 6
+  SHOWDOWNS = 7
+  N_COUNTERS = 8
+
+  RATES = ["vpip", "aggression", "fold_to_raise", "showdown"]
+
+  # a seat's rates start at these and move to its own numbers as they come in,
+  # PRIOR_WEIGHT is how many observations the prior counts for
+  PRIOR = [0.3, 0.5, 0.5, 0.3]
+  PRIOR_WEIGHT = 5
+
+  def __init__(self, n_players):
+    self.counts = [[0] * OpponentStats.N_COUNTERS for _ in range(n_players)]
+    self.vpip_this_hand = [False] * n_players
+    self.raised_this_round = False # someone raised (not a blind) this betting round
+
+  # `players` are dealt in a new hand
+  def start_hand(self, players):
+    for player in players:
+      self.vpip_this_hand[player.id] = False
+      if not player.last_action & Action.GONE:
+        self.counts[player.id][OpponentStats.HANDS] += 1
+    self.raised_this_round = False
+
+  # A new betting round, `players` still in the hand see the flop when it starts
+  def start_round(self, players, flop):
+    self.raised_this_round = False
+    if flop:
+      for player in players:
+        self.counts[player.id][OpponentStats.SAW_FLOP] += 1
+
+  # A betting action of the player at `seat`, after GameInstance has worked out what it comes to:
+  # `action` is what was stored (Action.CALL, Action.ALL_IN, ...), `bet_amount` the chips put in,
+  # `raised` whether it raised the highest bet and `facing` the chips it needed to call
+  def record_action(self, seat, action, bet_amount, raised, facing, preflop):
+    row = self.counts[seat]
+    if self.raised_this_round and facing > 0:
+      row[OpponentStats.FACED_RAISE] += 1
+      if action == Action.FOLD:
+        row[OpponentStats.FOLDED_TO_RAISE] += 1
+    if raised:
+      row[OpponentStats.RAISES] += 1
+      self.raised_this_round = True
+    elif bet_amount > 0:
+      row[OpponentStats.CALLS] += 1
+    if preflop and bet_amount > 0 and not self.vpip_this_hand[seat]:
+      self.vpip_this_hand[seat] = True
+      row[OpponentStats.VPIP] += 1
+
+  # `players` showed their hands down at the end of a hand
+  def record_showdown(self, players):
+    for player in players:
+      self.counts[player.id][OpponentStats.SHOWDOWNS] += 1
+
+  # Rates of the seat, in the order of OpponentStats.RATES
+  def rates(self, seat):
+    hands, vpip, raises, calls, faced_raise, folded_to_raise, saw_flop, showdowns = self.counts[seat]
+    k = OpponentStats.PRIOR_WEIGHT
+    prior_vpip, prior_aggression, prior_fold_to_raise, prior_showdown = OpponentStats.PRIOR
+    return [(vpip + prior_vpip * k) / (hands + k),
+            (raises + prior_aggression * k) / (raises + calls + k),
+            (folded_to_raise + prior_fold_to_raise * k) / (faced_raise + k),
+            (showdowns + prior_showdown * k) / (saw_flop + k)]
+
+  # Rates averaged over the seats in `seats`, OpponentStats.PRIOR if there are none
+  def average_rates(self, seats):
+    if not seats:
+      return OpponentStats.PRIOR[:]
+    vpip = aggression = fold_to_raise = showdown = 0.0
+    for seat in seats:
+      seat_vpip, seat_aggression, seat_fold_to_raise, seat_showdown = self.rates(seat)
+      vpip += seat_vpip
+      aggression += seat_aggression
+      fold_to_raise += seat_fold_to_raise
+      showdown += seat_showdown
+    n = len(seats)
+    return [vpip / n, aggression / n, fold_to_raise / n, showdown / n]
+
+  # All of the state as nested tuples, for GameInstance.snapshot
+  def snapshot(self):
+    return tuple(map(tuple, self.counts)), tuple(self.vpip_this_hand), self.raised_this_round
+
+  def restore(self, snapshot):
+    counts, vpip_this_hand, self.raised_this_round = snapshot
+    self.counts = [list(row) for row in counts]
+    self.vpip_this_hand = list(vpip_this_hand)
+
+  # {"vpip": ..., "aggression": ..., ...} of one seat
+  def seat_rates(self, seat):
+    return dict(zip(OpponentStats.RATES, self.rates(seat)))
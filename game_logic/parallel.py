@@ -0,0 +1,115 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from game_logic.batch_evaluator import BatchEvaluator
+from game_logic.equity import Equity
+
+
+# Runs equity sampling and batch hand evaluation across a pool of worker processes.
+# Work is split into fixed size chunks and every chunk gets its own RNG stream spawned from
+# one seed, so results only depend on the seed and chunk size, not on the number of workers
+# or on which worker picks up which chunk. Workers write their results straight into
+# shared memory buffers instead of pickling them back.
+#
+# The pool is kept alive between calls, use it as a context manager or call close():
+#   with ParallelRunner(workers=16) as runner:
+#     res = runner.equity(hole_cards, community_cards, 3, samples=1_000_000)
+# On platforms that spawn processes (Windows) the calling script needs a `__main__` guard.
+class ParallelRunner:
+  EQUITY_CHUNK_SIZE = 20000
+  EVALUATE_CHUNK_SIZE = 1 << 18
+
+  def __init__(self, workers=None):
+    self.workers = workers or os.cpu_count()
+    self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.close()
+
+  def close(self):
+    self.pool.shutdown()
+
+  # fn(*args) for every tuple of arguments, in order. fn must be a module level function
+  def map(self, fn, *iterables):
+    return list(self.pool.map(fn, *iterables))
+
+  # Monte Carlo equity (see Equity.monte_carlo) with the samples spread over the pool
+  def equity(self, hole_cards, community_cards, n_opponents, samples, seed=0, chunk_size=None):
+    chunk_size = chunk_size or ParallelRunner.EQUITY_CHUNK_SIZE
+    n_chunks = math.ceil(samples / chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    # one row per chunk: wins, ties, equity sum, equity sum of squares, samples
+    shm = shared_memory.SharedMemory(create=True, size=n_chunks * 5 * 8)
+    try:
+      jobs = []
+      for i in range(n_chunks):
+        chunk_samples = min(chunk_size, samples - i * chunk_size)
+        jobs.append(self.pool.submit(_equity_chunk, shm.name, n_chunks, i, seeds[i],
+                                     list(hole_cards), list(community_cards), n_opponents, chunk_samples))
+      for job in jobs:
+        job.result()
+
+      rows = np.ndarray((n_chunks, 5), dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+      shm.close()
+      shm.unlink()
+
+    totals = rows[:, :4].sum(axis=0)
+    return Equity.to_result(totals, int(rows[:, 4].sum()))
+
+  # BatchEvaluator.evaluate with the rows spread over the pool
+  def evaluate(self, cards, chunk_size=None):
+    cards = np.ascontiguousarray(cards, dtype=np.int64)
+    if cards.ndim != 2:
+      raise ValueError("Expected an (N, 7) array of cards, got shape " + str(cards.shape))
+    chunk_size = chunk_size or ParallelRunner.EVALUATE_CHUNK_SIZE
+    n = len(cards)
+
+    shm_in = shared_memory.SharedMemory(create=True, size=max(cards.nbytes, 1))
+    shm_out = shared_memory.SharedMemory(create=True, size=max(n * 8, 1))
+    try:
+      np.ndarray(cards.shape, dtype=np.int64, buffer=shm_in.buf)[:] = cards
+      jobs = [self.pool.submit(_evaluate_chunk, shm_in.name, shm_out.name, cards.shape, start, min(start + chunk_size, n))
+              for start in range(0, n, chunk_size)]
+      for job in jobs:
+        job.result()
+      scores = np.ndarray((n,), dtype=np.int64, buffer=shm_out.buf).copy()
+    finally:
+      for shm in [shm_in, shm_out]:
+        shm.close()
+        shm.unlink()
+
+    return scores, (scores // 10**12).astype(np.int8)
+
+
+# Worker functions live at module level so the pool can pickle them
+
+def _equity_chunk(shm_name, n_chunks, row, seed, hole_cards, community_cards, n_opponents, samples):
+  rng = np.random.default_rng(seed)
+  totals, n_samples = Equity.sample_totals(hole_cards, community_cards, n_opponents, samples, rng=rng)
+  shm = shared_memory.SharedMemory(name=shm_name)
+  try:
+    rows = np.ndarray((n_chunks, 5), dtype=np.float64, buffer=shm.buf)
+    rows[row, :4] = totals
+    rows[row, 4] = n_samples
+    del rows
+  finally:
+    shm.close()
+
+def _evaluate_chunk(in_name, out_name, shape, start, end):
+  shm_in = shared_memory.SharedMemory(name=in_name)
+  shm_out = shared_memory.SharedMemory(name=out_name)
+  try:
+    cards = np.ndarray(shape, dtype=np.int64, buffer=shm_in.buf)
+    scores = np.ndarray((shape[0],), dtype=np.int64, buffer=shm_out.buf)
+    scores[start:end] = BatchEvaluator.evaluate(cards[start:end])[0]
+    del cards, scores
+  finally:
+    shm_in.close()
+    shm_out.close()
@@ -1,27 +1,48 @@
+from game_logic.action import Action
+from game_logic.card import Card
+
 class Player:
   __ids = [] # store all player ids privately
-  def __init__(self, name, is_ai, id, chips=1000, cards=None):
+  __slots__ = ["id", "name", "chips", "last_action", "curr_bet", "cards", "is_ai", "ai_type", "won_last"]
+
+  # what decides an AI player's moves: Agent.predict or a MCTS search
+  AI_TYPES = ["agent", "mcts"]
+
+  def __init__(self, name, is_ai, id, chips=1000, cards=None, ai_type="agent"):
     self.id = id
     self.name = name
     self.chips = chips
     # NOTE: pending_out means the game ended and the player will be out on the next round
-    self.last_action = None # wait, fold, call, raise, all_in, pot_committed, out
+    self.last_action = Action.NONE # wait, fold, call, raise, all_in, pot_committed, pending_out, out
     self.curr_bet = 0
     self.cards = cards
     self.is_ai = is_ai
+    self.ai_type = ai_type
     self.won_last = False
 
   def pull_cards(self, deck):
     self.cards = [deck.pull(), deck.pull()]
 
   def can_do_action(self):
-    return self.chips > 0 and self.last_action not in ["all_in", "fold", "pending_out", "out"]
+    return self.chips > 0 and not self.last_action & Action.CANT_ACT
 
   def __str__(self):
     return (
         f"Player {self.id}: {self.name}\n" +
         f"\tchips: {self.chips}\n" +
-        f"\taction: {self.last_action}\n" +
+        f"\taction: {self.last_action.label}\n" +
         f"\tcurrent_bet: {self.curr_bet}\n" +
-        f"\tcards: {self.cards}\n"
-        )
\ No newline at end of file
+        f"\tcards: {Card.to_strs(self.cards)}\n"
+        )
+
+  def __getstate__(self):
+    return {name : getattr(self, name) for name in Player.__slots__}
+
+  # players pickled before cards and actions were ints hold card strings and action strings,
+  # players pickled before there was a choice of AI are played by the agent
+  def __setstate__(self, state):
+    state["cards"] = Card.from_saved(state["cards"])
+    state.setdefault("ai_type", "agent")
+    state["last_action"] = Action.parse(state["last_action"])
+    for name, value in state.items():
+      setattr(self, name, value)
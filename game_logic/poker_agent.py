@@ -1,6 +1,8 @@
+import logging
+
+log = logging.getLogger(__name__)
+
 def predict_ai_move(game_state_at_ai):
-    print("\nAI State input:")
-    for (key, value) in game_state_at_ai.items():
-        print(f"key: {key}, value: {value}")
-    print("AI action: call (hard-coded)\n")
+    log.debug("AI state input: %s", game_state_at_ai)
+    log.debug("AI action: call (hard-coded)")
     return "call"
@@ -31,39 +31,24 @@ class TempPot(Pot):
       bets[player.id] = 0
     super().__init__(bets)
 
+  # Split the bets into a main pot and side pots, smallest bet level first, and return them as Pots.
+  # Each pot takes the next bet level from everyone who bet at least that much, e.g. bets of
+  # {0: 50, 1: 20, 2: 50} give pots {0: 20, 1: 20, 2: 20} and {0: 30, 2: 30}. All bets are 0 afterwards
   def to_sidepots(self, end_of_game=False):
-    # Create the side pots
-    res_pots = []
-    while True:
-      # determine the next side pot
-      curr_pot = {}
-      smallest_bet = float('inf')
-
-      # find the smallest bet to make up the next side pot
-      for value in self.bets.values():
-        if value > 0:
-          smallest_bet = min(smallest_bet, value)
-
-      # if remaining bets are all $0, no more side pots are necessary
-      if smallest_bet == float('inf'):
-        break
-
-      # add smallest bet into current side pot for each valid participant
-      for key, value in self.bets.items():
-        if value > 0:
-          self.bets[key] -= smallest_bet
-          curr_pot[key] = smallest_bet
-
-      # A key-value pair for this pot has been made and values in `bets` have
-      # subtracted the smallest bet for this pot.
-      # Add the current subpot to the dictionary and proceed to the next one
-      res_pots.append(curr_pot)
+    # sort the bets once, then each pot is everyone from some point of the sorted list onwards
+    contributions = sorted((value, key) for key, value in self.bets.items() if value > 0)
 
     res = []
-    for res_pot in res_pots:
-      curr_pot = Pot(res_pot)
-      res.append(curr_pot)
-
+    level = 0
+    for i, (value, _) in enumerate(contributions):
+      if value == level:
+        continue
+      layer = value - level
+      res.append(Pot({key : layer for _, key in contributions[i:]}))
+      level = value
+
+    for key in self.bets:
+      self.bets[key] = 0
     return res
 
     def __str__(self):
@@ -0,0 +1,77 @@
+import argparse
+import os
+import time
+import numpy as np
+from game_logic.card import Card
+
+# Preflop equity of all 169 starting hands against 1-7 random opponents.
+# The table is generated once with `python -m game_logic.preflop_table` and saved as a .npy file
+# under assets/. It is memory mapped the first time it is needed, so a lookup is a single index.
+#
+# Layout: float32 (13, 13, 7, 4)
+#   [high rank, low rank] for suited hands, [low rank, high rank] for offsuit hands, pairs on the diagonal
+#   [n_opponents - 1]
+#   [win, tie, equity, margin] as in EquityResult
+class PreflopTable:
+  PATH = "assets/preflop_equity.npy"
+  MAX_OPPONENTS = 7
+
+  TABLE = None
+
+  # row and column of a starting hand in the table
+  @staticmethod
+  def index(hole_cards):
+    r1, r2 = Card.rank(hole_cards[0]), Card.rank(hole_cards[1])
+    high, low = max(r1, r2), min(r1, r2)
+    if Card.suit(hole_cards[0]) == Card.suit(hole_cards[1]):
+      return high, low
+    return low, high
+
+  # [win, tie, equity, margin] for a starting hand, None if there is no table for it
+  @staticmethod
+  def lookup(hole_cards, n_opponents):
+    if n_opponents < 1 or n_opponents > PreflopTable.MAX_OPPONENTS:
+      return None
+    if PreflopTable.TABLE is None:
+      if not os.path.exists(PreflopTable.PATH):
+        return None
+      PreflopTable.TABLE = np.load(PreflopTable.PATH, mmap_mode="r")
+    row, col = PreflopTable.index(hole_cards)
+    return PreflopTable.TABLE[row, col, n_opponents - 1]
+
+  # Compute the table with Monte Carlo equity, `samples` runouts per hand and opponent count
+  @staticmethod
+  def generate(samples, seed=0):
+    # imported here because Equity uses this table for its own preflop estimates
+    from game_logic.equity import Equity
+
+    rng = np.random.default_rng(seed)
+    table = np.zeros((13, 13, PreflopTable.MAX_OPPONENTS, 4), dtype=np.float32)
+    for row in range(13):
+      for col in range(13):
+        # any two cards with the right ranks and suitedness stand for the whole class
+        if row > col:
+          hole_cards = [row * 4, col * 4]
+        else:
+          hole_cards = [row * 4, col * 4 + 1]
+        for n_opponents in range(1, PreflopTable.MAX_OPPONENTS + 1):
+          res = Equity.monte_carlo(hole_cards, [Card.NA] * 5, n_opponents, samples=samples, rng=rng)
+          table[row, col, n_opponents - 1] = [res.win, res.tie, res.equity, res.margin]
+    return table
+
+  @staticmethod
+  def save(table, path=None):
+    np.save(path or PreflopTable.PATH, table)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Generate the preflop equity table")
+  parser.add_argument("--samples", type=int, default=20000, help="runouts per hand and opponent count")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--out", type=str, default=PreflopTable.PATH)
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  table = PreflopTable.generate(args.samples, args.seed)
+  PreflopTable.save(table, args.out)
+  print(f"Saved preflop equity table to {args.out} ({time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,341 @@
+import argparse
+import random
+import time
+import numpy as np
+from game_logic.action import Action
+from game_logic.game import GameInstance
+from game_logic.hand_evaluator import HandEvaluator
+from game_logic.logs import Logs
+from game_logic.mcts import MCTS
+from game_logic.parallel import ParallelRunner
+from game_logic.player import Player
+from local_ml.agent import Agent
+from objects.gamestate import GameState
+
+
+# Result of a simulation run
+# hands:       number of complete hands played
+# seconds:     wall time spent playing them
+# net_chips:   chips won (or lost, if negative) by each seat over all hands
+# rebuys:      times a table was reset because fewer than two players had chips left
+# decisions:   moves the policies made, hands get longer or shorter with how the seats play so
+#              decisions per second compares the speed of runs with different policies or tables better
+# tables:      number of tables the hands were played on
+class SimulationResult:
+  def __init__(self, hands, seconds, net_chips, rebuys, decisions=0, tables=1):
+    self.hands = hands
+    self.seconds = seconds
+    self.net_chips = net_chips
+    self.rebuys = rebuys
+    self.decisions = decisions
+    self.tables = tables
+
+  def hands_per_second(self):
+    return self.hands / self.seconds if self.seconds > 0 else float("inf")
+
+  def decisions_per_second(self):
+    return self.decisions / self.seconds if self.seconds > 0 else float("inf")
+
+  # Results of tables played side by side added up, taking `seconds` of wall time in all
+  @staticmethod
+  def combine(results, seconds):
+    net_chips = [sum(chips) for chips in zip(*(res.net_chips for res in results))]
+    return SimulationResult(sum(res.hands for res in results), seconds, net_chips, sum(res.rebuys for res in results),
+                            sum(res.decisions for res in results), sum(res.tables for res in results))
+
+  def __str__(self):
+    tables = f" on {self.tables} tables" if self.tables > 1 else ""
+    res = (f"{self.hands} hands{tables} in {self.seconds:.2f}s ({self.hands_per_second():.0f} hands/s, " +
+           f"{self.decisions_per_second():.0f} decisions/s), {self.rebuys} rebuys\n")
+    for seat, chips in enumerate(self.net_chips):
+      res += f"\tseat {seat}: {chips:+d} chips ({chips / max(self.hands, 1):+.2f}/hand)\n"
+    return res
+
+
+# Plays complete hands of GameInstance without the play screen: cards come from the virtual deck
+# (USE_PHYSICAL_DECK = False), the board is dealt straight from it and every seat is driven by a policy.
+# A policy is any function `policy(game_instance, pos) -> (action, bet)` with the same action and bet
+# meaning as GameInstance.step, e.g. Simulator.agent_policy or Simulator.random_policy.
+#
+#   sim = Simulator([Simulator.agent_policy, Simulator.random_policy], seed=1)
+#   print(sim.run(10000))
+class Simulator:
+  STARTING_CHIPS = 1000
+
+  # search used by mcts_policy, with a budget small enough to simulate many hands
+  SEARCH = MCTS(time_budget_ms=20)
+
+  # number of community cards on the table once each scan state is reached
+  BOARD_SIZE = {
+    GameState.SCAN_FLOP : 3,
+    GameState.SCAN_TURN : 4,
+    GameState.SCAN_RIVER : 5,
+    GameState.SCAN_PLAYER_HAND : 5
+  }
+
+  # equity_samples is the AI_EQUITY_SAMPLES budget used for get_state_ai while simulating.
+  # It defaults to 0 (no estimate), like GameInstance.AI_EQUITY_SAMPLES, while the equity weights are untrained
+  def __init__(self, policies, starting_chips=None, seed=None, equity_samples=0):
+    self.policies = policies
+    self.starting_chips = starting_chips or Simulator.STARTING_CHIPS
+    self.equity_samples = equity_samples
+    if seed is not None:
+      # the dealer button and the policies draw from `random`
+      random.seed(seed)
+    self.players = [Player(f"Seat {i}", is_ai=True, id=i, chips=self.starting_chips) for i in range(len(policies))]
+    self.game_instance = GameInstance(self.players)
+    if seed is not None:
+      # the cards get a generator of their own, so with the same seed every run is dealt the same
+      # cards whatever the policies do (common random numbers when comparing policies)
+      self.game_instance.deck_rng = random.Random(seed)
+    self.rebuys = 0
+    self.decisions = 0
+
+  # Play `hands` complete hands and time them.
+  # Runs continue from the table as the previous run left it
+  def run(self, hands):
+    saved_settings = Simulator.headless(self.equity_samples)
+    net_chips = [0 for _ in self.players]
+    decisions = self.decisions
+    try:
+      start = time.perf_counter()
+      for _ in range(hands):
+        for seat, chips in enumerate(self.play_hand()):
+          net_chips[seat] += chips
+      seconds = time.perf_counter() - start
+    finally:
+      Simulator.restore_settings(saved_settings)
+
+    return SimulationResult(hands, seconds, net_chips, self.rebuys, self.decisions - decisions)
+
+  # Switch GameInstance to the virtual deck and the given equity budget, returns the settings to
+  # put back with restore_settings. Also builds the hand lookup tables so that isn't counted in the timing
+  @staticmethod
+  def headless(equity_samples):
+    saved_settings = GameInstance.USE_PHYSICAL_DECK, GameInstance.AI_EQUITY_SAMPLES
+    GameInstance.USE_PHYSICAL_DECK = False
+    GameInstance.AI_EQUITY_SAMPLES = equity_samples
+    if HandEvaluator.RANK_TABLE is None:
+      HandEvaluator.build_tables()
+    return saved_settings
+
+  @staticmethod
+  def restore_settings(saved_settings):
+    GameInstance.USE_PHYSICAL_DECK, GameInstance.AI_EQUITY_SAMPLES = saved_settings
+
+  # Play one hand from blinds to showdown, returns each seat's chip change
+  def play_hand(self):
+    hand = self.hand_steps()
+    pos = next(hand)
+    try:
+      while True:
+        pos = hand.send(self.policies[pos](self.game_instance, pos))
+    except StopIteration as end:
+      return end.value
+
+  # One hand as a generator: yields the seat that has to decide, takes its (action, bet) through send()
+  # and returns each seat's chip change. play_hand drives it with the seat policies, MultiTableSimulator
+  # drives several at once to batch the decisions
+  def hand_steps(self):
+    game = self.game_instance
+    if sum(1 for player in self.players if player.chips > 0) < 2:
+      self.rebuy()
+    chips_before = [player.chips for player in self.players]
+
+    if game.start_game() == GameState.ERROR_STATE:
+      raise RuntimeError("Simulator: could not start a new game")
+    state = game.step() # blinds
+    board = 0
+    while True:
+      if state in Simulator.BOARD_SIZE:
+        while board < Simulator.BOARD_SIZE[state]:
+          game.set_community_card(board, game.deck.pull())
+          board += 1
+        if state == GameState.SCAN_PLAYER_HAND:
+          game.end_game()
+          break
+
+      pos = game.curr_pos
+      self.decisions += 1
+      action, bet = yield pos
+      state = game.step(action, bet)
+      if state == GameState.ERROR_STATE:
+        raise RuntimeError(f"Simulator: seat {pos} made an invalid move ({action}, {bet})")
+
+    return [player.chips - chips_before[i] for i, player in enumerate(self.players)]
+
+  # everyone gets their starting chips back once the table can't play another hand
+  def rebuy(self):
+    for player in self.players:
+      player.chips = self.starting_chips
+      player.last_action = Action.NONE
+      player.curr_bet = 0
+    self.rebuys += 1
+
+  # Policies
+
+  @staticmethod
+  def agent_policy(game_instance, pos):
+    return Agent.predict_observation(game_instance.get_observation(pos))
+
+  # checks/calls half the time, otherwise folds (only when facing a bet) or makes a random sized raise
+  @staticmethod
+  def random_policy(game_instance, pos):
+    player = game_instance.players[pos]
+    min_req_bet = game_instance.get_min_required_bet(player)
+    roll = random.random()
+    if roll < 0.5:
+      return "call", 0
+    if roll < 0.75 and min_req_bet > 0:
+      return "fold", 0
+    max_raise = player.chips - min_req_bet
+    if max_raise <= 0:
+      return "call", 0
+    return "raise", random.randint(1, max_raise)
+
+  # agent_policy for many decisions at once, [(game_instance, pos)] -> [(action, bet)]: one Agent.predict_batch
+  # call instead of a predict per decision. Draws from its own numpy generator, not from `random`
+  @staticmethod
+  def agent_batch_policy(decisions, rng):
+    actions, bets = Agent.predict_batch([game.get_observation(pos) for game, pos in decisions], rng)
+    return list(zip(actions.tolist(), bets.tolist()))
+
+  @staticmethod
+  def call_policy(game_instance, pos):
+    return "call", 0
+
+  @staticmethod
+  def mcts_policy(game_instance, pos):
+    return Simulator.SEARCH.decide(game_instance, pos)
+
+  POLICIES = {
+    "agent" : agent_policy,
+    "random" : random_policy,
+    "call" : call_policy,
+    "mcts" : mcts_policy
+  }
+
+  # policies MultiTableSimulator can decide for all its tables in one call
+  BATCH_POLICIES = {
+    "agent" : agent_batch_policy
+  }
+
+
+# Several Simulator tables played in lockstep in one process. Each table plays until a seat has to
+# decide, then the seats with a batch policy (the agent) decide for every table in one call
+# (Simulator.BATCH_POLICIES), the others one at a time. Policies are given by name (Simulator.POLICIES).
+# Table i gets seed + i, so no two tables are dealt the same cards.
+#
+#   sim = MultiTableSimulator(["agent", "random"], tables=32, seed=1)
+#   print(sim.run(10000))
+class MultiTableSimulator:
+  def __init__(self, policy_names, tables, starting_chips=None, seed=None, equity_samples=0):
+    self.policy_names = policy_names
+    self.equity_samples = equity_samples
+    policies = [Simulator.POLICIES[name] for name in policy_names]
+    self.tables = [Simulator(policies, starting_chips, None if seed is None else seed + i, equity_samples)
+                   for i in range(tables)]
+    self.rng = np.random.default_rng(seed)
+
+  # Play `hands` complete hands in all, spread over the tables
+  def run(self, hands):
+    saved_settings = Simulator.headless(self.equity_samples)
+    net_chips = [0 for _ in self.policy_names]
+    decisions_before = sum(table.decisions for table in self.tables)
+    try:
+      start = time.perf_counter()
+      started = 0
+      # table -> (hand in progress, seat waiting for a decision)
+      waiting = {}
+      for table in self.tables[:hands]:
+        hand = table.hand_steps()
+        waiting[table] = hand, next(hand)
+        started += 1
+
+      while waiting:
+        decisions = {}
+        by_policy = {}
+        for table, (hand, pos) in waiting.items():
+          name = self.policy_names[pos]
+          # a batch of one is slower than the policy itself
+          if name in Simulator.BATCH_POLICIES and len(waiting) > 1:
+            by_policy.setdefault(name, []).append(table)
+          else:
+            decisions[table] = table.policies[pos](table.game_instance, pos)
+        for name, tables in by_policy.items():
+          moves = Simulator.BATCH_POLICIES[name]([(table.game_instance, waiting[table][1]) for table in tables], self.rng)
+          decisions.update(zip(tables, moves))
+
+        for table, move in decisions.items():
+          hand = waiting[table][0]
+          try:
+            waiting[table] = hand, hand.send(move)
+          except StopIteration as end:
+            for seat, chips in enumerate(end.value):
+              net_chips[seat] += chips
+            if started < hands:
+              hand = table.hand_steps()
+              waiting[table] = hand, next(hand)
+              started += 1
+            else:
+              del waiting[table]
+      seconds = time.perf_counter() - start
+    finally:
+      Simulator.restore_settings(saved_settings)
+
+    return SimulationResult(hands, seconds, net_chips, sum(table.rebuys for table in self.tables),
+                            sum(table.decisions for table in self.tables) - decisions_before, len(self.tables))
+
+
+# `workers` MultiTableSimulators in a ParallelRunner pool, each with `tables` tables of its own and
+# its share of the hands. The result's time is the wall time of the whole run, pool start up included
+def simulate_parallel(policy_names, hands, workers, tables=1, starting_chips=None, seed=None, equity_samples=0):
+  # forked workers inherit the lookup tables instead of each building them
+  if HandEvaluator.RANK_TABLE is None:
+    HandEvaluator.build_tables()
+  shares = [hands // workers + (1 if w < hands % workers else 0) for w in range(workers)]
+  if seed is None:
+    # forked workers start from this process' random state, unseeded they would all deal the same cards
+    seed = random.randrange(1 << 30)
+  seeds = [None if seed is None else seed + w * tables for w in range(workers)]
+  start = time.perf_counter()
+  with ParallelRunner(workers) as runner:
+    results = runner.map(_simulate_tables, [policy_names] * workers, shares, [tables] * workers,
+                         [starting_chips] * workers, seeds, [equity_samples] * workers,
+                         [Simulator.SEARCH.time_budget_ms] * workers)
+  return SimulationResult.combine(results, time.perf_counter() - start)
+
+# worker of simulate_parallel, at module level so the pool can pickle it
+def _simulate_tables(policy_names, hands, tables, starting_chips, seed, equity_samples, mcts_ms):
+  Simulator.SEARCH.time_budget_ms = mcts_ms
+  return MultiTableSimulator(policy_names, tables, starting_chips, seed, equity_samples).run(hands)
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Play poker hands headless and report hands per second")
+  parser.add_argument("--hands", type=int, default=10000)
+  parser.add_argument("--players", type=int, default=6)
+  parser.add_argument("--policies", nargs="+", default=["agent"], choices=list(Simulator.POLICIES),
+                      help="policy of each seat, repeated to fill the table")
+  parser.add_argument("--chips", type=int, default=Simulator.STARTING_CHIPS, help="starting chips per seat")
+  parser.add_argument("--seed", type=int, default=None)
+  parser.add_argument("--equity-samples", type=int, default=0,
+                      help="AI_EQUITY_SAMPLES for get_state_ai, 0 skips the equity estimate")
+  parser.add_argument("--mcts-ms", type=int, default=Simulator.SEARCH.time_budget_ms,
+                      help="time budget of each mcts policy decision in milliseconds")
+  parser.add_argument("--tables", type=int, default=1,
+                      help="tables played in lockstep per process, the agent decides for all of them at once")
+  parser.add_argument("--workers", type=int, default=1, help="processes to spread the tables over")
+  Logs.add_arguments(parser)
+  args = parser.parse_args()
+  Logs.configure(args.log)
+  Simulator.SEARCH.time_budget_ms = args.mcts_ms
+
+  names = [args.policies[i % len(args.policies)] for i in range(args.players)]
+  if args.workers > 1:
+    print(simulate_parallel(names, args.hands, args.workers, args.tables, args.chips, args.seed, args.equity_samples))
+  elif args.tables > 1:
+    print(MultiTableSimulator(names, args.tables, args.chips, args.seed, args.equity_samples).run(args.hands))
+  else:
+    sim = Simulator([Simulator.POLICIES[name] for name in names], args.chips, args.seed, args.equity_samples)
+    print(sim.run(args.hands))
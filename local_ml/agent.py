@@ -1,42 +1,170 @@
+import json
+import logging
+import os
 import numpy as np
 import random
+from game_logic.observation import Observation
+from game_logic.opponent_stats import OpponentStats
+
+log = logging.getLogger(__name__)
 
 class Agent:
-    weights = np.array([
-    [ 0.03819951, -1.03508064, -0.09588605,  0.13251864, -0.093688, 0.07726153, -1.03986483],
-    [ 0.10600337, -0.27609087,  0.09610159,  0.11690603,  0.23743165, 0.09855287, -1.02726204],
-    [ 2.02151456,  0.19825743, -0.05227324, -0.19804504, -0.30202788, -4.94772216,  2.55037178]])
+    # rows: fold, call and raise heads; columns: 11 feature weights (see process_state) + the head's pass threshold.
+    # The opponent statistics and equity features were added later and start out unused
+    DEFAULT_WEIGHTS = np.array([
+    [ 0.03819951, -1.03508064, -0.09588605,  0.13251864, -0.093688, 0.07726153, 0.0, 0.0, 0.0, 0.0, 0.0, -1.03986483],
+    [ 0.10600337, -0.27609087,  0.09610159,  0.11690603,  0.23743165, 0.09855287, 0.0, 0.0, 0.0, 0.0, 0.0, -1.02726204],
+    [ 2.02151456,  0.19825743, -0.05227324, -0.19804504, -0.30202788, -4.94772216, 0.0, 0.0, 0.0, 0.0, 0.0, 2.55037178]])
+    N_FEATURES = 11
+
+    # Weights trained by local_ml/training.py are read from here when this module is imported,
+    # DEFAULT_WEIGHTS are used if the file doesn't exist
+    WEIGHTS_PATH = "assets/agent_weights.json"
+    WEIGHTS_VERSION = 3 # 1: no opponent statistics features, 2: no equity feature
+
+    weights = DEFAULT_WEIGHTS
+
+    ACTIONS = np.array(['fold', 'call', 'raise'])
+
+    # river_state names, and the value of the river state feature for each
+    ROUNDS = {'PREFLOP': 0, 'FLOP': 1, 'TURN': 2, 'RIVER': 3}
+    ROUND_FEATURES = np.array([0.0, 0.3333333, 0.6666666, 1.0])
 
+    # one row per table state, see Observation
+    STATE_DTYPE = Observation.DTYPE
+
+    # weights: a (3, N_FEATURES + 1) matrix to decide with instead of Agent.weights (e.g. a training candidate)
     @staticmethod
-    def predict(ai_state):
+    def predict(ai_state, weights=None):
+        if weights is None:
+            weights = Agent.weights
+
         # process ai_state
         p_s = Agent.process_state(ai_state)
-        
+        return Agent.decide(p_s, ai_state['ai_chips'] - ai_state['min_req_bet'], weights)
+
+    # `predict` for an Observation (GameInstance.get_observation)
+    @staticmethod
+    def predict_observation(obs, weights=None):
+        if weights is None:
+            weights = Agent.weights
+        p_s = Agent.process_observation(obs)
+        return Agent.decide(p_s, obs.chips - obs.min_req_bet, weights)
+
+    # fold/call/raise decision for a feature vector, raising at most `max_raise` chips
+    @staticmethod
+    def decide(p_s, max_raise, weights):
         # should fold?
-        fold_class = p_s @ Agent.weights[0][:-1]
-        pass_fold = Agent.sigmoid(Agent.weights[0][-1]) > random.random()
+        fold_class = p_s @ weights[0][:-1]
+        pass_fold = Agent.sigmoid(weights[0][-1]) > random.random()
         if fold_class > 0 and not pass_fold:
             return 'fold', 0
         
         # # should call or raise?
-        call_class = p_s @ Agent.weights[1][:-1]
-        pass_call = Agent.sigmoid(Agent.weights[1][-1]) > random.random()
+        call_class = p_s @ weights[1][:-1]
+        pass_call = Agent.sigmoid(weights[1][-1]) > random.random()
         if call_class > 0 and not pass_call:
             return 'call', 0
         
         # # how much raise?
-        raise_out = (p_s @ Agent.weights[2][:-1])
+        raise_out = (p_s @ weights[2][:-1])
         raise_activated = Agent.sigmoid(raise_out)
-        raise_chips = int(round(raise_activated * (ai_state['ai_chips'] - ai_state['min_req_bet'])))
+        raise_chips = int(round(raise_activated * max_raise))
         
         if raise_chips <= 0:
             return "call", 0
             
         return 'raise', raise_chips
     
+    # Batched `predict` for many table states at once.
+    # `ai_states` is a list of get_state_ai dicts or Observations, or an array of Agent.STATE_DTYPE.
+    # Returns (actions, bets): an array of 'fold'/'call'/'raise' and an int array of raise sizes (0 unless raising).
+    # Decisions follow the same rules as `predict`, with the random draws taken from `rng` (a numpy Generator)
+    @staticmethod
+    def predict_batch(ai_states, rng=None, weights=None):
+        if rng is None:
+            rng = np.random.default_rng()
+        if weights is None:
+            weights = Agent.weights
+        states = Agent.to_state_array(ai_states)
+        p_s = Agent.process_states(states)
+
+        # all three heads in one multiply: (N, N_FEATURES) @ (N_FEATURES, 3)
+        outputs = p_s @ weights[:, :-1].T
+        passes = Agent.sigmoid(weights[:2, -1]) > rng.random((len(states), 2))
+
+        fold = (outputs[:, 0] > 0) & ~passes[:, 0]
+        call = ~fold & (outputs[:, 1] > 0) & ~passes[:, 1]
+        raise_chips = np.rint(Agent.sigmoid(outputs[:, 2]) * (states['chips'] - states['min_req_bet'])).astype(np.int64)
+        raises = ~fold & ~call & (raise_chips > 0)
+
+        codes = np.where(fold, 0, np.where(raises, 2, 1))
+        return Agent.ACTIONS[codes], np.where(raises, raise_chips, 0)
+
+    # List of get_state_ai dicts or Observations -> array of Agent.STATE_DTYPE, arrays of that dtype are passed through
+    @staticmethod
+    def to_state_array(ai_states):
+        if isinstance(ai_states, np.ndarray):
+            return ai_states
+        if len(ai_states) > 0 and isinstance(ai_states[0], Observation):
+            return Observation.to_array(ai_states)
+        states = np.zeros(len(ai_states), dtype=Agent.STATE_DTYPE)
+        states['round'] = [Agent.ROUNDS.get(s['river_state'], 0) for s in ai_states]
+        states['hand_strength'] = [s['ai_hand_strength'] for s in ai_states]
+        states['equity'] = [np.nan if s.get('ai_equity') is None else s['ai_equity'] for s in ai_states]
+        states['chips'] = [s['ai_chips'] for s in ai_states]
+        states['curr_bet'] = [s['ai_curr_bet'] for s in ai_states]
+        states['total_bets'] = [s['ai_total_bets'] for s in ai_states]
+        states['min_req_bet'] = [s['min_req_bet'] for s in ai_states]
+        states['raised'] = [s['ai_last_action'] == 'raise' for s in ai_states]
+        states['pot_round'] = [s['pot_round'] for s in ai_states]
+        states['pot_game'] = [s['pot_game'] for s in ai_states]
+        states['players_in'] = [s['players_in'] for s in ai_states]
+        states['pos_from_dealer'] = [s['pos_from_dealer'] for s in ai_states]
+        states['n_opponents'] = [s.get('n_opponents', 1) for s in ai_states]
+        for i, rate in enumerate(OpponentStats.RATES):
+            states['opp_' + rate] = [s.get('opp_' + rate, OpponentStats.PRIOR[i]) for s in ai_states]
+        return states
+
+    # Batched `process_state`: (N,) array of Agent.STATE_DTYPE -> (N, 11) feature matrix
+    @staticmethod
+    def process_states(states):
+        p_s = np.empty((len(states), Agent.N_FEATURES))
+        p_s[:, 0] = Agent.ROUND_FEATURES[states['round']]
+        p_s[:, 1] = np.log10((states['hand_strength'] / 0.8e13) - 0.03) + 1.0
+        curr_chips = states['chips'].astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_s[:, 2] = 1 - (curr_chips / (curr_chips + states['total_bets']))
+        p_s[:, 3] = states['min_req_bet'] / (curr_chips + 1e-5)
+        p_s[:, 4] = states['raised']
+        p_s[:, 5] = 1.0
+        p_s[:, 6] = states['opp_vpip']
+        p_s[:, 7] = states['opp_aggression']
+        p_s[:, 8] = states['opp_fold_to_raise']
+        p_s[:, 9] = states['opp_showdown']
+        p_s[:, 10] = np.where(np.isnan(states['equity']), 1.0 / (states['n_opponents'] + 1.0), states['equity'])
+        return p_s
+
+    # `process_state` for an Observation, no string parsing
+    @staticmethod
+    def process_observation(obs):
+        curr_chips = float(obs.chips)
+        return np.array([
+            Agent.ROUND_FEATURES[obs.round],
+            np.log10((obs.hand_strength / 0.8e13) - 0.03) + 1.0,
+            1 - (curr_chips / (curr_chips + obs.total_bets)),
+            obs.min_req_bet / (curr_chips + 1e-5),
+            1.0 if obs.raised else 0.0,
+            1.0,
+            obs.opp_vpip,
+            obs.opp_aggression,
+            obs.opp_fold_to_raise,
+            obs.opp_showdown,
+            Agent.equity_feature(obs.equity, obs.n_opponents)])
+
     @staticmethod
     def process_state(ai_state):
-        p_s = np.ndarray(6,)
+        p_s = np.ndarray(Agent.N_FEATURES,)
         
         # river state
         if ai_state['river_state'] == 'PREFLOP':
@@ -66,11 +194,73 @@ class Agent:
         
         # bias
         p_s[5] = 1.0
+
+        # how the opponents still in the hand have played so far (OpponentStats rates)
+        for i, rate in enumerate(OpponentStats.RATES):
+            p_s[6 + i] = ai_state.get('opp_' + rate, OpponentStats.PRIOR[i])
+
+        # chance of winning the pot
+        equity = ai_state.get('ai_equity')
+        p_s[10] = Agent.equity_feature(np.nan if equity is None else equity, ai_state.get('n_opponents', 1))
     
         return p_s
 
+    # The equity estimate (GameInstance.get_equity), or an even share of the pot when it wasn't
+    # estimated (NaN, AI_EQUITY_SAMPLES = 0) so the feature is always a number
+    @staticmethod
+    def equity_feature(equity, n_opponents):
+        if equity != equity: # NaN
+            return 1.0 / (n_opponents + 1)
+        return equity
+
     
+    # Weights file: {"version": 3, "weights": [[...] * 12] * 3, ...training info}
+    # Older files are read with zero weights for the features they don't have: version 1 (7 columns)
+    # for the opponent statistics and equity features, version 2 (11 columns) for the equity feature.
+    # Returns True if Agent.weights were replaced
+    @staticmethod
+    def load_weights(path=None):
+        path = path or Agent.WEIGHTS_PATH
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') not in [1, 2, Agent.WEIGHTS_VERSION]:
+                log.warning("Ignoring %s: weights file version %s, expected %s", path, data.get('version'), Agent.WEIGHTS_VERSION)
+                return False
+            weights = np.array(data['weights'], dtype=np.float64)
+            if data['version'] == 1 and weights.ndim == 2:
+                weights = np.insert(weights, [6] * (Agent.N_FEATURES - 6), 0.0, axis=1)
+            elif data['version'] == 2 and weights.ndim == 2:
+                weights = np.insert(weights, [10] * (Agent.N_FEATURES - 10), 0.0, axis=1)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("Ignoring %s: %s", path, e)
+            return False
+        if weights.shape != Agent.DEFAULT_WEIGHTS.shape:
+            log.warning("Ignoring %s: weights have shape %s, expected %s", path, weights.shape, Agent.DEFAULT_WEIGHTS.shape)
+            return False
+
+        Agent.weights = weights
+        log.info("Loaded agent weights from %s (generation %s)", path, data.get('generation'))
+        return True
+
+    # Write weights with any extra training info (generation, fitness, ...) to a weights file.
+    # The file is replaced in one step so a reader never sees half a checkpoint
+    @staticmethod
+    def save_weights(weights, path=None, **info):
+        path = path or Agent.WEIGHTS_PATH
+        data = {'version': Agent.WEIGHTS_VERSION, 'weights': np.asarray(weights).tolist()}
+        data.update(info)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
     @staticmethod
     def sigmoid(x):
         # print(x)
-        return 1.0 / (1.0 + np.exp(-x))
\ No newline at end of file
+        return 1.0 / (1.0 + np.exp(-x))
+
+
+Agent.load_weights()
@@ -0,0 +1,80 @@
+import argparse
+import time
+import cv2
+import numpy as np
+from local_ml.card_detection import CardModel, KerasSession, TFLiteClassifier, class_names, class_probs, labeled_images, load_keras_model, prepare_image
+
+
+# Result of classifying a labeled folder with one backend
+# load_seconds:  time to load and warm up the model (for keras including the TensorFlow imports)
+# latencies:     seconds per classify call, one per image
+# predictions:   predicted class of each image
+class BenchmarkResult:
+    def __init__(self, name, load_seconds, latencies, predictions, labels):
+        self.name = name
+        self.load_seconds = load_seconds
+        self.latencies = np.array(latencies)
+        self.predictions = predictions
+        self.labels = labels
+
+    def accuracy(self):
+        return np.mean([p == l for p, l in zip(self.predictions, self.labels)])
+
+    def __str__(self):
+        ms = self.latencies * 1000
+        return (f"{self.name}: accuracy {self.accuracy():.2%} on {len(self.labels)} images, loaded in {self.load_seconds:.2f}s\n" +
+                f"\tlatency: median {np.median(ms):.1f}ms, p95 {np.percentile(ms, 95):.1f}ms, mean {ms.mean():.1f}ms\n")
+
+
+# Latency and accuracy of the card model's backends on a labeled image folder (one subfolder per
+# class, see card_detection.labeled_images). Every image goes through class_probs, the same call
+# classify_card makes, on a model warmed up the way CardModel does it. TFLite models are compared
+# against the Keras model:
+#   python -m local_ml.card_benchmark data/cards --tflite assets/models/card_model_int8.tflite assets/models/card_model_f16.tflite
+class CardBenchmark:
+    def __init__(self, folder, limit=None):
+        images = list(labeled_images(folder))[:limit]
+        if not images:
+            raise ValueError(f"No labeled images in {folder}")
+        self.labels = [label for _, label in images]
+        self.images = [prepare_image(cv2.imread(path)) for path, _ in images]
+
+    def run(self, name, load):
+        start = time.perf_counter()
+        model = load()
+        model.warm_up()
+        load_seconds = time.perf_counter() - start
+
+        latencies = []
+        predictions = []
+        for img in self.images:
+            start = time.perf_counter()
+            probs = class_probs(model, [img])[0]
+            latencies.append(time.perf_counter() - start)
+            predictions.append(class_names[probs.argmax()])
+        return BenchmarkResult(name, load_seconds, latencies, predictions, self.labels)
+
+    # How `result` compares with the baseline (the Keras model)
+    @staticmethod
+    def compare(result, baseline):
+        agreement = np.mean([p == b for p, b in zip(result.predictions, baseline.predictions)])
+        speedup = np.median(baseline.latencies) / np.median(result.latencies)
+        return (f"{result.name} vs {baseline.name}: accuracy {(result.accuracy() - baseline.accuracy()) * 100:+.2f} points, " +
+                f"{agreement:.2%} same predictions, median latency x{speedup:.2f} faster, loads in {result.load_seconds:.2f}s vs {baseline.load_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare latency and accuracy of the card model backends")
+    parser.add_argument("folder", help="labeled image folder, one subfolder per class (AS, TD, ...)")
+    parser.add_argument("--tflite", nargs="*", default=[CardModel.MODEL_PATHS['tflite']], help="TFLite models to compare")
+    parser.add_argument("--keras", type=str, default=CardModel.MODEL_PATHS['keras'], help="Keras model to compare against")
+    parser.add_argument("--limit", type=int, default=None, help="use only the first LIMIT images")
+    args = parser.parse_args()
+
+    bench = CardBenchmark(args.folder, args.limit)
+    baseline = bench.run("keras", lambda: KerasSession(load_keras_model(args.keras)))
+    print(baseline)
+    for path in args.tflite:
+        result = bench.run(path, lambda: TFLiteClassifier(path))
+        print(result)
+        print(CardBenchmark.compare(result, baseline))
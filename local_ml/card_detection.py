@@ -1,41 +1,258 @@
 import argparse
+import cv2
+import logging
 import numpy as np
 import os
+import threading
+
+log = logging.getLogger(__name__)
 
 # debug flag for tensorflow model
 parser = argparse.ArgumentParser()
 parser.add_argument('--debug-tf', type=str, default='false')
-args = parser.parse_args()
+# keras: the .h5 model through TensorFlow, tflite: a model exported with local_ml.export_tflite
+parser.add_argument('--card-backend', type=str, default='keras', choices=['keras', 'tflite'])
+parser.add_argument('--card-model', type=str, default=None, help='model file of the backend (default: CardModel.MODEL_PATHS)')
+args, _ = parser.parse_known_args() # other flags (e.g. --log) belong to main.py
 
 debug_mode = args.debug_tf.lower() == 'true'
 if debug_mode:
-    print('DEBUG MODE FOR TENSORFLOW MODEL')
+    log.warning('Debug mode for TensorFlow model, card detection is disabled')
 
 # # Clear cache directory
 #os.environ["TFHUB_CACHE_DIR"] = "/nonexistent/directory"
 
-model = None
-if not debug_mode:
-    import tensorflow as tf
-    from tensorflow.keras.saving import load_model
+
+# The card classifier, loaded on a background thread.
+# Importing TensorFlow and loading the model takes long enough that doing it at import time kept the
+# app from opening a window, so nothing is loaded until `start` is called (the title screen does once
+# it is on screen). `progress` and `status` describe the loading step in progress for a loading bar;
+# `wait` blocks until the model is ready and is only slow if it is called before then.
+# The model is a KerasSession, or a TFLiteClassifier with the tflite backend. Both are warmed up while
+# loading and have `predict(batch) -> probabilities` and a preallocated input `buffer` (see class_probs).
+class CardModel:
+    MODEL_PATHS = {
+        'keras': "assets/models/17_effv2b0_ft_alt2_lr1e-4_d80p_6e.h5",
+        'tflite': "assets/models/card_model_int8.tflite"
+    }
+
+    def __init__(self, backend='keras', path=None):
+        self.backend = backend
+        self.path = path or CardModel.MODEL_PATHS[backend]
+        self.model = None
+        self.progress = 0.0 # 0 to 1
+        self.status = "Card model not loaded"
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    # Start loading in the background, if it hasn't been started already
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._load, name="card-model", daemon=True)
+            self._thread.start()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    # The loaded model (None in --debug-tf mode), loading it first if `start` hasn't been called.
+    # Raises RuntimeError if it couldn't be loaded
+    def wait(self):
+        self.start()
+        if not self._ready.is_set():
+            log.info("Waiting for the card model to finish loading")
+            self._ready.wait()
+        if self.error is not None:
+            raise RuntimeError("The card model could not be loaded") from self.error
+        return self.model
+
+    def _step(self, progress, status):
+        self.progress = progress
+        self.status = status
+        log.info(status)
+
+    def _load(self):
+        try:
+            if debug_mode:
+                self._step(1.0, "Card detection disabled (--debug-tf)")
+                return
+            if self.backend == 'tflite':
+                # the interpreter is a small import, nearly all of the time is reading the model
+                self._step(0.1, "Loading card model")
+                model = TFLiteClassifier(self.path)
+                self._step(0.8, "Warming up card model")
+                model.warm_up()
+                self.model = model
+            else:
+                # the steps take very different times, progress is a rough share of the total
+                self._step(0.05, "Importing TensorFlow")
+                import tensorflow
+                self._step(0.6, "Importing TensorFlow Hub")
+                import tensorflow_hub
+                self._step(0.7, "Loading card model")
+                session = KerasSession(load_keras_model(self.path))
+                self._step(0.85, "Warming up card model")
+                session.warm_up()
+                self.model = session
+            self._step(1.0, "Card model ready")
+        except Exception as e:
+            self.error = e
+            self.status = "Card model failed to load"
+            log.exception("Could not load the card model")
+        finally:
+            self._ready.set()
+
+
+# The Keras card model with its TensorFlow Hub layer
+def load_keras_model(path=CardModel.MODEL_PATHS['keras']):
     import tensorflow_hub as hub
+    from tensorflow.keras.saving import load_model
     try:
-        model = load_model("assets/models/17_effv2b0_ft_alt2_lr1e-4_d80p_6e.h5", custom_objects={'KerasLayer':hub.KerasLayer}) if not debug_mode else None
+        return load_model(path, custom_objects={'KerasLayer':hub.KerasLayer})
     except:
         os.environ["TFHUB_CACHE_DIR"] = "/nonexistent/directory"
-        model = load_model("assets/models/17_effv2b0_ft_alt2_lr1e-4_d80p_6e.h5", custom_objects={'KerasLayer':hub.KerasLayer}) if not debug_mode else None
+        return load_model(path, custom_objects={'KerasLayer':hub.KerasLayer})
+
+
+# The Keras model called through a compiled tf.function instead of model.predict, which sets up a
+# Keras data pipeline on every call. warm_up traces the graph with a dummy batch, so the first scan of
+# a game only pays for the forward pass. The graph takes any batch size without tracing again.
+class KerasSession:
+    def __init__(self, model):
+        import tensorflow as tf
+        self.model = model
+        self.buffer = np.zeros((1,224,224,3), dtype=np.float32)
+        self.forward = tf.function(lambda batch: model(batch, training=False),
+                                   input_signature=[tf.TensorSpec((None,224,224,3), tf.float32)])
+
+    def warm_up(self):
+        self.predict(self.buffer)
+
+    # batch: (n, 224, 224, 3) float32 in [0, 1] -> (n, 52) probabilities
+    def predict(self, batch):
+        return self.forward(batch).numpy()
+
+
+# A TFLite flatbuffer (see local_ml.export_tflite) run on the TFLite interpreter, with the same
+# predict(batch) -> probabilities as KerasSession. Uses the standalone tflite_runtime package if it is
+# installed, so a kiosk can run it without TensorFlow, and tf.lite otherwise.
+# The batch is written straight into the interpreter's input tensor and the probabilities are read
+# from its output tensor, so a call allocates nothing but the returned array. Quantized inputs and
+# outputs (an int8 export) are converted with the tensors' scale and zero point.
+class TFLiteClassifier:
+    def __init__(self, path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.buffer = np.zeros((1,224,224,3), dtype=np.float32)
+
+    # the first invoke sets up the interpreter's kernels
+    def warm_up(self):
+        self.predict(self.buffer)
+
+    def _resize(self, batch_size):
+        shape = list(self.input['shape'])
+        shape[0] = batch_size
+        self.interpreter.resize_tensor_input(self.input['index'], shape)
+        self.interpreter.allocate_tensors()
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+
+    # batch: (n, 224, 224, 3) floats in [0, 1] -> (n, 52) probabilities
+    def predict(self, batch):
+        if batch.shape[0] != self.input['shape'][0]:
+            self._resize(batch.shape[0])
+
+        # views of the interpreter's buffers, they mustn't be held on to across invoke
+        input_tensor = self.interpreter.tensor(self.input['index'])()
+        scale, zero_point = self.input['quantization']
+        if scale:
+            info = np.iinfo(input_tensor.dtype)
+            input_tensor[...] = np.clip(np.rint(batch / scale + zero_point), info.min, info.max)
+        else:
+            input_tensor[...] = batch
+        del input_tensor
+
+        self.interpreter.invoke()
+
+        output_tensor = self.interpreter.tensor(self.output['index'])()
+        scale, zero_point = self.output['quantization']
+        if scale:
+            return (output_tensor.astype(np.float32) - zero_point) * scale
+        return output_tensor.copy()
+
+
+card_model = CardModel(args.card_backend, args.card_model)
 
 class_names = ['2C', '2D', '2H', '2S', '3C', '3D', '3H', '3S', '4C', '4D', '4H', '4S', '5C', '5D', '5H', '5S', '6C', '6D', '6H', '6S', '7C', '7D', '7H', '7S', '8C', '8D', '8H', '8S', '9C', '9D', '9H', '9S', 'AC', 'AD', 'AH', 'AS', 'JC', 'JD', 'JH', 'JS', 'KC', 'KD', 'KH', 'KS', 'QC', 'QD', 'QH', 'QS', 'TC', 'TD', 'TH', 'TS']
 
 
+# A camera crop as classify_card takes it: BGR (as OpenCV reads it) -> 224x224 RGB
+def prepare_image(img):
+    img = cv2.resize(img, dsize=(224, 224), interpolation=cv2.INTER_CUBIC)
+    return np.array(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+
+
+# (path, label) of every image in a labeled folder: one subfolder per card named after its class ("AS", "TD", ...)
+def labeled_images(folder):
+    for label in sorted(os.listdir(folder)):
+        if label not in class_names:
+            continue
+        class_folder = os.path.join(folder, label)
+        for filename in sorted(os.listdir(class_folder)):
+            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                yield os.path.join(class_folder, filename), label
+
+
+# Probabilities of every class in class_names for a list of 224x224 RGB images, (n, 52), in one forward pass.
+# The images are normalized straight into the model's preallocated float32 buffer (grown if a bigger
+# batch comes), so a scan doesn't allocate an input array. Callers share the buffer, classify from one
+# thread at a time
+def class_probs(model, images):
+    n = len(images)
+    if model.buffer.shape[0] < n:
+        model.buffer = np.zeros((n,224,224,3), dtype=np.float32)
+    batch = model.buffer[:n]
+    for i, img in enumerate(images):
+        np.multiply(img, 1 / 255., out=batch[i], casting='unsafe')
+    return model.predict(batch)
+
+
+# What the card model made of one image
+# label:        most likely class ("AS", "TD", ...)
+# probability:  the model's probability of it
+# top_k:        the k most likely classes with their probabilities, best first (label is top_k[0])
+class CardPrediction:
+    def __init__(self, label, probability, top_k):
+        self.label = label
+        self.probability = probability
+        self.top_k = top_k
+
+    def __str__(self):
+        return ", ".join(f"{label} {prob:.1%}" for label, prob in self.top_k)
+
+
 def classify_card(img):
+    return classify_cards([img])[0].label
+
+
+# CardPredictions of several 224x224 RGB card images, stacked into one batch for a single forward pass
+# (see class_probs), each with its `k` most likely classes
+def classify_cards(images, k=3):
     if debug_mode:
-        return '2C'
-    img = img / 255.
-    img = np.array(img)
-    img = img.reshape((1,224,224,3))
-    pred_probs = model.predict(img)
-    pred_class = class_names[pred_probs.argmax()]
-    pred_prob = max(pred_probs[0])
-    pred_prob = str(round(pred_prob * 100, 2)) + "%"
-    return pred_class
\ No newline at end of file
+        return [CardPrediction('2C', 1.0, [('2C', 1.0)]) for _ in images]
+    pred_probs = class_probs(card_model.wait(), images)
+    top = np.argsort(-pred_probs, axis=1)[:, :k]
+    predictions = []
+    for probs, classes in zip(pred_probs, top):
+        top_k = [(class_names[i], float(probs[i])) for i in classes]
+        predictions.append(CardPrediction(top_k[0][0], top_k[0][1], top_k))
+    return predictions
@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+
+# Finds the cards in a camera frame, so several cards (the flop, a player's two hole cards) can be
+# captured in one picture. Cards are the bright, roughly card shaped quadrilaterals on the darker table:
+# the frame is thresholded (Otsu), the outer contours are simplified to polygons and every convex
+# four cornered one of a plausible size and shape is a card. Each card is warped flat to the
+# 224x224 input of the card model.
+#
+#   crops = CardLocator.crops(frame, 3) # up to 3 cards, as they appear on screen
+class CardLocator:
+    SIZE = 224
+    MIN_AREA = 0.01 # share of the frame a card covers at least
+    MAX_AREA = 0.9
+    ASPECT = (0.5, 0.9) # short side / long side, a poker card is about 0.71
+    APPROX_EPSILON = 0.02 # polygon simplification, share of the contour's perimeter
+
+    # Corners of up to `max_cards` cards in the frame (the biggest ones if there are more), each
+    # ordered top left, top right, bottom right, bottom left of the upright card
+    @staticmethod
+    def find(frame, max_cards=None):
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        frame_area = frame.shape[0] * frame.shape[1]
+        found = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if not CardLocator.MIN_AREA * frame_area <= area <= CardLocator.MAX_AREA * frame_area:
+                continue
+            approx = cv2.approxPolyDP(contour, CardLocator.APPROX_EPSILON * cv2.arcLength(contour, True), True)
+            if len(approx) != 4 or not cv2.isContourConvex(approx):
+                continue
+            corners = CardLocator.order_corners(approx.reshape(4, 2).astype(np.float32))
+            width = np.linalg.norm(corners[1] - corners[0])
+            height = np.linalg.norm(corners[3] - corners[0])
+            if not CardLocator.ASPECT[0] <= min(width, height) / max(width, height) <= CardLocator.ASPECT[1]:
+                continue
+            found.append((area, corners))
+
+        found.sort(key=lambda card: -card[0])
+        cards = [corners for _, corners in found[:max_cards]]
+        # the camera window shows the frame mirrored, so right to left in the frame is left to right on screen
+        cards.sort(key=lambda corners: -corners[:, 0].mean())
+        return cards
+
+    # Top left, top right, bottom right, bottom left, turned so the card's long side is its height
+    @staticmethod
+    def order_corners(points):
+        sums = points.sum(axis=1)
+        diffs = points[:, 1] - points[:, 0]
+        corners = np.array([points[sums.argmin()], points[diffs.argmin()],
+                            points[sums.argmax()], points[diffs.argmax()]])
+        if np.linalg.norm(corners[1] - corners[0]) > np.linalg.norm(corners[3] - corners[0]):
+            corners = np.roll(corners, -1, axis=0) # lying on its side, start from the top right instead
+        return corners
+
+    # The card inside `corners` seen straight on, SIZE x SIZE
+    @staticmethod
+    def warp(frame, corners):
+        size = CardLocator.SIZE
+        target = np.array([[0, 0], [size - 1, 0], [size - 1, size - 1], [0, size - 1]], dtype=np.float32)
+        transform = cv2.getPerspectiveTransform(corners, target)
+        return cv2.warpPerspective(frame, transform, (size, size), flags=cv2.INTER_CUBIC)
+
+    # Flattened 224x224 crops of up to `max_cards` cards in the frame, as they appear on screen
+    @staticmethod
+    def crops(frame, max_cards=None):
+        return [CardLocator.warp(frame, corners) for corners in CardLocator.find(frame, max_cards)]
@@ -0,0 +1,71 @@
+import argparse
+import itertools
+import logging
+import cv2
+import numpy as np
+from game_logic.logs import Logs
+from local_ml.card_detection import CardModel, labeled_images, load_keras_model, prepare_image
+
+log = logging.getLogger("local_ml.export_tflite") # not __name__, which is "__main__" when run with -m
+
+# Converts the Keras card model to a TFLite flatbuffer for the tflite backend of card_detection
+# (python main.py --card-backend tflite --card-model PATH).
+#
+#   float16: weights stored as float16, everything else float32. Half the size, near the Keras accuracy
+#   int8:    weights and activations quantized to 8 bits, calibrated on images from a labeled folder.
+#            The input tensor is uint8 pixels, so the interpreter's quantize step just undoes the /255.
+#            Smallest and fastest on CPU, check the accuracy with local_ml.card_benchmark
+#
+#   python -m local_ml.export_tflite --quantize int8 --calibration-dir data/cards
+class TFLiteExporter:
+    CALIBRATION_IMAGES = 200
+
+    def __init__(self, model_path=CardModel.MODEL_PATHS['keras']):
+        self.model = load_keras_model(model_path)
+
+    def export(self, quantize, out, calibration_dir=None, calibration_images=CALIBRATION_IMAGES):
+        import tensorflow as tf
+        converter = tf.lite.TFLiteConverter.from_keras_model(self.model)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantize == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantize == 'int8':
+            if calibration_dir is None:
+                raise ValueError("int8 quantization needs calibration images (calibration_dir)")
+            converter.representative_dataset = lambda: TFLiteExporter.calibration_batches(calibration_dir, calibration_images)
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            converter.inference_input_type = tf.uint8
+            converter.inference_output_type = tf.float32
+        else:
+            raise ValueError(f"Unknown quantization {quantize!r}")
+
+        flatbuffer = converter.convert()
+        with open(out, 'wb') as f:
+            f.write(flatbuffer)
+        log.info("Wrote %s (%s, %.1f MB)", out, quantize, len(flatbuffer) / 2**20)
+
+    # Inputs of the float model for calibrating the activation ranges, spread over all the classes
+    @staticmethod
+    def calibration_batches(folder, limit):
+        images = list(labeled_images(folder))
+        step = max(len(images) // limit, 1)
+        for path, _ in itertools.islice(images[::step], limit):
+            img = prepare_image(cv2.imread(path))
+            yield [(img / 255.).astype(np.float32).reshape((1,224,224,3))]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the card model to a quantized TFLite flatbuffer")
+    parser.add_argument("--quantize", choices=["int8", "float16"], default="int8")
+    parser.add_argument("--calibration-dir", type=str, default=None,
+                        help="labeled image folder (one subfolder per class) to calibrate int8 with")
+    parser.add_argument("--calibration-images", type=int, default=TFLiteExporter.CALIBRATION_IMAGES)
+    parser.add_argument("--model", type=str, default=CardModel.MODEL_PATHS['keras'], help="Keras model to convert")
+    parser.add_argument("--out", type=str, default=None,
+                        help="output file (default: CardModel.MODEL_PATHS['tflite'] for int8)")
+    Logs.add_arguments(parser)
+    args = parser.parse_args()
+    Logs.configure(["local_ml.export_tflite=info"] + args.log)
+
+    out = args.out or (CardModel.MODEL_PATHS['tflite'] if args.quantize == 'int8' else "assets/models/card_model_f16.tflite")
+    TFLiteExporter(args.model).export(args.quantize, out, args.calibration_dir, args.calibration_images)
@@ -0,0 +1,122 @@
+import argparse
+import logging
+import time
+import numpy as np
+from game_logic.logs import Logs
+from game_logic.parallel import ParallelRunner
+from game_logic.simulator import Simulator
+from local_ml.agent import Agent
+
+log = logging.getLogger("local_ml.training") # not __name__, which is "__main__" when run with -m
+
+# Self-play training of Agent.weights with evolution strategies (ES).
+#
+# Every generation draws `population` perturbations of the current weights (in +/- pairs) and has each
+# candidate play `tables` headless tables of `hands` hands in seat 0 against the current weights in
+# every other seat. A candidate's fitness is the chips it wins per hand. All candidates of a generation
+# play the same table seeds, so they are dealt exactly the same cards (common random numbers) and the
+# differences between them come from their decisions rather than from luck of the deal.
+# The weights then move along the rank weighted sum of the perturbations.
+#
+# Tables are played in parallel on a ParallelRunner. After each generation the weights are written to
+# a weights file (Agent.WEIGHTS_PATH by default), which Agent loads at startup:
+#   python -m local_ml.training --generations 50 --workers 8
+class Trainer:
+    def __init__(self, weights=None, population=16, sigma=0.1, learning_rate=0.05,
+                 tables=4, hands=200, players=6, seed=0, workers=None, equity_samples=0):
+        if population % 2:
+            raise ValueError("population must be even, candidates come in +/- pairs")
+        self.weights = np.array(Agent.weights if weights is None else weights, dtype=np.float64)
+        self.population = population
+        self.sigma = sigma
+        self.learning_rate = learning_rate
+        self.tables = tables
+        self.hands = hands
+        self.players = players
+        self.seed = seed
+        self.workers = workers
+        self.equity_samples = equity_samples # AI_EQUITY_SAMPLES while playing, 0 leaves the equity feature at its default
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+
+        # fixed seeds for comparing each generation against Agent.DEFAULT_WEIGHTS
+        self.eval_seeds = self.rng.integers(2**31, size=tables).tolist()
+
+    # Run `generations` ES steps, writing a checkpoint to `out` after each one
+    def train(self, generations, out=None):
+        with ParallelRunner(self.workers) as runner:
+            for _ in range(generations):
+                start = time.perf_counter()
+                fitness = self.step(runner)
+                score = self.evaluate(runner, self.weights, Agent.DEFAULT_WEIGHTS, self.eval_seeds)
+                Agent.save_weights(self.weights, out, generation=self.generation, score_vs_default=score,
+                                   population=self.population, sigma=self.sigma, learning_rate=self.learning_rate,
+                                   hands=self.hands * self.tables, players=self.players, seed=self.seed)
+                log.info("generation %d: fitness %.2f (best %.2f), %.2f chips/hand vs default weights (%.1fs)",
+                         self.generation, fitness.mean(), fitness.max(), score, time.perf_counter() - start)
+        return self.weights
+
+    # One generation, returns the fitness of every candidate
+    def step(self, runner):
+        half = self.rng.standard_normal((self.population // 2,) + self.weights.shape)
+        noise = np.concatenate([half, -half])
+        seeds = self.rng.integers(2**31, size=self.tables).tolist()
+
+        jobs = [(self.weights + self.sigma * eps, seed) for eps in noise for seed in seeds]
+        chips = runner.map(_play_table, [w for w, _ in jobs], [self.weights] * len(jobs), [s for _, s in jobs],
+                           [self.hands] * len(jobs), [self.players] * len(jobs), [self.equity_samples] * len(jobs))
+        fitness = np.array(chips).reshape(self.population, self.tables).mean(axis=1)
+
+        ranks = Trainer.centered_ranks(fitness)
+        gradient = np.tensordot(ranks, noise, axes=1) / (self.population * self.sigma)
+        self.weights = self.weights + self.learning_rate * gradient
+        self.generation += 1
+        return fitness
+
+    # chips per hand won by `weights` in seat 0 against `opponent_weights`, averaged over the seeds
+    def evaluate(self, runner, weights, opponent_weights, seeds):
+        n = len(seeds)
+        return float(np.mean(runner.map(_play_table, [weights] * n, [opponent_weights] * n, seeds,
+                                        [self.hands] * n, [self.players] * n, [self.equity_samples] * n)))
+
+    # fitness -> ranks scaled to [-0.5, 0.5], so the update doesn't depend on the size of a few big pots
+    @staticmethod
+    def centered_ranks(values):
+        ranks = np.empty(len(values))
+        ranks[np.argsort(values)] = np.arange(len(values))
+        return ranks / (len(values) - 1) - 0.5
+
+
+# Worker function for the pool: one table, `weights` in seat 0 and `opponent_weights` everywhere else.
+# Returns seat 0's chips won per hand
+def _play_table(weights, opponent_weights, seed, hands, players, equity_samples=0):
+    policies = [lambda game, pos: Agent.predict_observation(game.get_observation(pos), weights)]
+    policies += [lambda game, pos: Agent.predict_observation(game.get_observation(pos), opponent_weights)] * (players - 1)
+    res = Simulator(policies, seed=seed, equity_samples=equity_samples).run(hands)
+    return res.net_chips[0] / hands
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train Agent.weights by self-play with evolution strategies")
+    parser.add_argument("--generations", type=int, default=50)
+    parser.add_argument("--population", type=int, default=16, help="candidates per generation (even)")
+    parser.add_argument("--sigma", type=float, default=0.1, help="standard deviation of the weight perturbations")
+    parser.add_argument("--learning-rate", type=float, default=0.05)
+    parser.add_argument("--tables", type=int, default=4, help="tables each candidate plays per generation")
+    parser.add_argument("--hands", type=int, default=200, help="hands per table")
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--equity-samples", type=int, default=0,
+                        help="equity estimate budget per decision, needed to train the equity feature's weights (slow)")
+    parser.add_argument("--out", type=str, default=Agent.WEIGHTS_PATH)
+    parser.add_argument("--from-default", action="store_true",
+                        help="start from Agent.DEFAULT_WEIGHTS instead of the weights file")
+    Logs.add_arguments(parser)
+    args = parser.parse_args()
+    Logs.configure(["local_ml.training=info"] + args.log)
+
+    trainer = Trainer(Agent.DEFAULT_WEIGHTS if args.from_default else None, args.population, args.sigma,
+                      args.learning_rate, args.tables, args.hands, args.players, args.seed, args.workers,
+                      args.equity_samples)
+    trainer.train(args.generations, args.out)
@@ -1,8 +1,10 @@
+import argparse
 import pygame
 import pygame_gui # gui rewrite
 import os # detect system
 import ctypes # windows displays
 
+from game_logic.logs import Logs
 from objects.scheme import Scheme
 from objects.screenstate import ScreenState
 
@@ -67,6 +69,11 @@ class xtcApp:
             
 import os
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    Logs.add_arguments(parser)
+    args, _ = parser.parse_known_args() # --debug-tf is read by local_ml.card_detection
+    Logs.configure(args.log)
+
     app = xtcApp()
     app.run()
 
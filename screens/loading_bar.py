@@ -0,0 +1,26 @@
+import pygame
+from objects.scheme import Scheme
+
+Colors = Scheme()
+
+
+# Startup progress drawn along the bottom of the pygame window while the card model loads in the
+# background (see local_ml.card_detection.CardModel). The title screen draws it every frame until
+# the model is ready:
+#   loading_bar.draw(window, card_model.progress, card_model.status)
+class LoadingBar:
+    def __init__(self, width, height):
+        pygame.font.init()
+        self.font = pygame.font.Font('assets/jbm-regular.ttf', 18)
+        self.bar_width = width * 0.3
+        self.bar_height = 8
+        self.x = (width - self.bar_width) / 2
+        self.y = height - 40
+
+    def draw(self, window, progress, status):
+        text = self.font.render(status, True, Colors.window_header)
+        window.blit(text, text.get_rect(centerx=self.x + self.bar_width / 2, bottom=self.y - 6))
+        pygame.draw.rect(window, Colors.button_bg, (self.x, self.y, self.bar_width, self.bar_height), border_radius=4)
+        filled = self.bar_width * min(max(progress, 0.0), 1.0)
+        if filled > 0:
+            pygame.draw.rect(window, Colors.window_header, (self.x, self.y, filled, self.bar_height), border_radius=4)
@@ -1,8 +1,9 @@
 import pygame
 import pygame_gui
-import threading
 import pickle
+import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pygame_gui.elements import UILabel
 from pygame_gui.elements import UITextBox
 
@@ -23,16 +24,19 @@ from windows.cam_window import camWindow
 from windows.info_window import infoWindow
 from windows.church_window import churchWindow
 
+from game_logic.action import Action
 from game_logic.game import GameInstance
+from game_logic.mcts import MCTS
 from game_logic.player import Player
+from game_logic.card import Card
 
-from local_ml.card_detection import classify_card
+from local_ml.card_detection import classify_cards, prepare_image
+from local_ml.card_locator import CardLocator
 from local_ml.agent import Agent
 
 import pygame.camera
 
 # image proc
-import cv2
 import base64
 import requests
 import json
@@ -43,6 +47,15 @@ pickleswitch = False
 save_state = None
 
 class playScreen:
+    # AI moves are worked out on this worker thread as soon as the AI's turn starts, while the
+    # render loop keeps drawing and checks the future every frame. It is kept for the whole app
+    # so every turn doesn't start a new thread
+    ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai")
+
+    # Cosmetic: an AI's move is shown no sooner than this many seconds (drawn from the range) after its
+    # turn starts, or once it is worked out if that takes longer. (0, 0) shows moves as soon as they're ready
+    AI_THINKING_TIME = (2, 7)
+
     def __init__(self, manager, window, state):
         global save_state
 
@@ -67,7 +80,10 @@ class playScreen:
 
             self.results_displayed = False
             self.camClicked = False
-            self.aiThinking = save_state['aithinking']
+            # a move that was being worked out isn't saved, the AI starts its turn over
+            self.ai_future = None
+            self.ai_ready_at = 0
+            self.mcts = MCTS()
 
             # Class variable for a new GameInstance from game_logic/game.py.
             # This variable is updated after number of players/AI is selected.
@@ -102,7 +118,9 @@ class playScreen:
 
             self.results_displayed = False
             self.camClicked = False
-            self.aiThinking = 0
+            self.ai_future = None
+            self.ai_ready_at = 0
+            self.mcts = MCTS()
 
             # Class variable for a new GameInstance from game_logic/game.py.
             # This variable is updated after number of players/AI is selected.
@@ -187,7 +205,7 @@ class playScreen:
             # LOAD FROM SAVED PICKLE
             self.player_index = save_state['player_index']  # keep track of which player we are operating on
             self.card_index = save_state['card_index']  # which card are we scanning
-            self.cards_scanned = save_state['cards_scanned']
+            self.cards_scanned = Card.from_saved(save_state['cards_scanned'])
 
             # bet set up
             result_width = self.width * .3
@@ -444,7 +462,7 @@ class playScreen:
                     self.church_button.show()
 
                     self.table = tableWindow(manager=manager, pos=tablepos)
-                    if (self.game_instance.community_cards != ['NA', 'NA', 'NA', 'NA', 'NA']):
+                    if (self.game_instance.community_cards != [Card.NA] * 5):
                         self.updateTable(self.game_instance.community_cards)  # update the table from saved community cards
 
                     self.result_table = resultsWindow(manager=manager, pos=resultpos)
@@ -502,7 +520,8 @@ class playScreen:
                     curr_id += 1
                 
                 for i in range(self.players.aiplayercount):
-                    ai = Player(name=self.players.aiPlayerNames[i], is_ai=True, chips=chips, id=curr_id)
+                    ai = Player(name=self.players.aiPlayerNames[i], is_ai=True, chips=chips, id=curr_id,
+                                ai_type=setupWindow.ai_types[i])
                     game_participants.append(ai)
                     curr_id += 1
 
@@ -547,25 +566,14 @@ class playScreen:
                 self.header.set_text('Scan AI Cards')
 
                 if (self.camClicked):
-                    cards_to_scan = 2
-
-                    while (self.player_index < len(self.game_instance.players) and not self.game_instance.players[self.player_index].is_ai):
-                        self.player_index += 1
+                    # AI seats still to scan, their hands can all go in one capture (see handOutCards)
+                    seats = [p.id for p in self.game_instance.players if p.is_ai and p.id >= self.player_index]
                     
-                    if (self.player_index < len(self.game_instance.players)):
-                        curr_player = self.game_instance.players[self.player_index]
-                        
-                        self.camwindow.instruction_label.set_text( "%s's cards - %d of 2" % (curr_player.name, self.card_index+1) )
+                    if (seats):
+                        self.camwindow.instruction_label.set_text(self.handsLabel(seats))
 
                         if (self.camwindow.snaptaken):
-                            self.cards_scanned.append(self.scanCard())
-                            self.card_index += 1
-                        
-                        if (self.card_index >= cards_to_scan):
-                            self.card_index = 0
-                            curr_player.cards = self.cards_scanned
-                            self.cards_scanned = []
-                            self.player_index += 1
+                            self.handOutCards(self.scanCards(2*len(seats) - self.card_index), seats)
                     else: # done scanning cards
                         self.camwindow.scanning_ai_cards = False
                         self.player_index = 0
@@ -615,18 +623,18 @@ class playScreen:
                 else: # bet window open
                     pl = self.game_instance.players[player_pos]
                     if pl.is_ai:
-                        if (self.aiThinking == 0):
-                            thread = threading.Thread(target=self.threadMethod)
-                            thread.start()
-                        if self.aiThinking == 1:
+                        if (self.ai_future == None):
+                            self.ai_future = playScreen.ai_executor.submit(self.decideAI, self.game_instance, player_pos)
+                            self.ai_ready_at = time.perf_counter() + random.uniform(*playScreen.AI_THINKING_TIME)
                             self.betwindow.kill()
                             fileName= "assets/ai_characters/" + pl.name + ".png"
                             self.ai_character.set_image(pygame.image.load(fileName))
                             self.ai_character.show()
                             self.header.set_text(player + " is thinking...")
                             self.bible_text.show()
-                        if self.aiThinking == 2:
-                            p_action, p_bet = Agent.predict(self.game_instance.get_state_ai(player_pos))
+                        elif self.ai_future.done() and time.perf_counter() >= self.ai_ready_at:
+                            p_action, p_bet = self.ai_future.result()
+                            self.ai_future = None
                             if p_action == 'fold':
                                 self.next_state = self.game_instance.step(p_action)
                             else:
@@ -639,7 +647,6 @@ class playScreen:
                             self.betwindow = None
                             self.bible_text.hide()
                             self.ai_character.hide()
-                            self.aiThinking = 0
                     else:
                         if (self.betwindow.folds):
                             self.betwindow.kill()
@@ -726,13 +733,13 @@ class playScreen:
                         self.camwindow.instruction_label.set_text( "Scan flop - %d of 3" % (self.card_index+1) )
 
                         if (self.camwindow.snaptaken):
-                            card = self.scanCard()
-                            self.game_instance.community_cards[self.card_index] = card
+                            for card in self.scanCards(cards_to_scan - self.card_index):
+                                self.game_instance.set_community_card(self.card_index, card)
+                                self.card_index += 1
                             self.updateTable(self.game_instance.community_cards) # update the table
-                            self.card_index += 1
                     if (self.card_index == cards_to_scan):
                         self.killCamera()
-                        print(self.game_instance.community_cards)
+                        print(Card.to_strs(self.game_instance.community_cards))
                         self.game_state = GameState.POST_FLOP_BETS
                 else:
                     self.viewCamera(manager, campos) # open camera window
@@ -745,13 +752,13 @@ class playScreen:
                         self.camwindow.instruction_label.set_text( "Scan turn - %d of 1" % (self.card_index+1-3) )
 
                         if (self.camwindow.snaptaken):
-                            card = self.scanCard()
-                            self.game_instance.community_cards[self.card_index] = card
+                            for card in self.scanCards(cards_to_scan - self.card_index):
+                                self.game_instance.set_community_card(self.card_index, card)
+                                self.card_index += 1
                             self.updateTable(self.game_instance.community_cards) # update the table
-                            self.card_index += 1
                     if (self.card_index == cards_to_scan):
                         self.killCamera()
-                        print(self.game_instance.community_cards)
+                        print(Card.to_strs(self.game_instance.community_cards))
                         self.game_state = GameState.POST_TURN_BETS
                 else:
                     self.viewCamera(manager, campos) # open camera window
@@ -764,20 +771,20 @@ class playScreen:
                         self.camwindow.instruction_label.set_text( "Scan river - %d of 1" % (self.card_index+1-4) )
 
                         if (self.camwindow.snaptaken):
-                            card = self.scanCard()
-                            self.game_instance.community_cards[self.card_index] = card
+                            for card in self.scanCards(cards_to_scan - self.card_index):
+                                self.game_instance.set_community_card(self.card_index, card)
+                                self.card_index += 1
                             self.updateTable(self.game_instance.community_cards) # update the table
-                            self.card_index += 1
                     if (self.card_index == cards_to_scan):
                         self.card_index = 0
                         self.killCamera()
-                        print(self.game_instance.community_cards)
+                        print(Card.to_strs(self.game_instance.community_cards))
                         self.game_state = GameState.FINAL_BETS
                 else:
                     self.viewCamera(manager, campos) # open camera window
 
             # Reached end of game before all community cards have been scanned
-            if self.game_state == GameState.SCAN_PLAYER_HAND and self.game_instance.community_cards[-1] == 'NA':
+            if self.game_state == GameState.SCAN_PLAYER_HAND and self.game_instance.community_cards[-1] == Card.NA:
                 if (self.camClicked):
                     cards_to_scan = 5
 
@@ -785,13 +792,13 @@ class playScreen:
                         self.camwindow.instruction_label.set_text( "Scan river - %d of 5" % (self.card_index+1) )
 
                         if (self.camwindow.snaptaken):
-                            card = self.scanCard()
-                            self.game_instance.community_cards[self.card_index] = card
+                            for card in self.scanCards(cards_to_scan - self.card_index):
+                                self.game_instance.set_community_card(self.card_index, card)
+                                self.card_index += 1
                             self.updateTable(self.game_instance.community_cards) # update the table
-                            self.card_index += 1
                     if (self.card_index == cards_to_scan):
                         self.card_index = 0
-                        print(self.game_instance.community_cards)
+                        print(Card.to_strs(self.game_instance.community_cards))
                         self.bank.value_label.set_text(str(self.game_instance.get_total_pot_value()))
                         for players in self.players.player_action_list:
                             players.set_text('')
@@ -802,31 +809,19 @@ class playScreen:
                     self.viewCamera(manager, campos) # open camera window
 
             # end of game, scan player hands
-            if (self.game_state == GameState.SCAN_PLAYER_HAND and self.game_instance.community_cards[-1] != 'NA'):
+            if (self.game_state == GameState.SCAN_PLAYER_HAND and self.game_instance.community_cards[-1] != Card.NA):
                 if (self.camClicked):
                     self.camwindow.scanning_ai_cards = False
-                    cards_to_scan = 2
 
-                    while (self.player_index < len(self.game_instance.players) and (self.game_instance.players[self.player_index].is_ai or self.game_instance.players[self.player_index].last_action == 'fold')):
-                        self.player_index += 1
+                    # players still in the hand, their hands can all go in one capture (see handOutCards)
+                    seats = [p.id for p in self.game_instance.players
+                             if not p.is_ai and p.last_action != Action.FOLD and p.id >= self.player_index]
                     
-                    if (self.player_index < len(self.game_instance.players) and self.game_instance.players[self.player_index].last_action != 'fold'):
-                        curr_player = self.game_instance.players[self.player_index]
-                        
-                        self.camwindow.instruction_label.set_text( "%s's cards - %d of 2" % (curr_player.name, self.card_index+1) )
+                    if (seats):
+                        self.camwindow.instruction_label.set_text(self.handsLabel(seats))
 
                         if (self.camwindow.snaptaken):
-                            self.cards_scanned.append(self.scanCard())
-                            self.card_index += 1
-                        
-                        if (self.card_index >= cards_to_scan):
-                            self.card_index = 0
-                            print("PLAYER %s CARDS:" % (curr_player.name))
-                            curr_player.cards = self.cards_scanned
-                            self.game_instance.players[self.player_index].cards = curr_player.cards
-                            print(curr_player.cards)
-                            self.cards_scanned = []
-                            self.player_index += 1
+                            self.handOutCards(self.scanCards(2*len(seats) - self.card_index), seats)
                     else: 
                         self.player_index = 0
                         self.card_index = 0
@@ -836,6 +831,7 @@ class playScreen:
 
                         self.killCamera()
                         self.game_state = GameState.END_ROUND # ready for reveal
+                        showdown_equity = self.game_instance.showdown_equity() # before end_game counts players out
                         rankings, results = self.game_instance.end_game()
                 else:
                     self.viewCamera(manager, campos) # open camera window
@@ -853,7 +849,7 @@ class playScreen:
                         self.player_chips = player.chips
                         player_label = self.players.player_labels_list[position]
                         player_label.set_text(player.name + ":  " + str(self.player_chips) + "  |  ")
-                    self.result_text.set_text(text[:-2] + "\nTop Hand: " + winning_hand + "\n") 
+                    self.result_text.set_text(text[:-2] + "\nTop Hand: " + winning_hand + "\n" + self.equityText(showdown_equity)) 
                     self.header.set_text('Split Pot!')
                     # self.player_actions.append("Split pot between the players shown!")
                     # self.updateGameLog(self.player_actions)
@@ -862,7 +858,7 @@ class playScreen:
                     winning_hand = rankings[0][0][2]
                     for position, chips in results.items():
                         player = self.game_instance.players[position]
-                        self.result_text.set_text(f"{player.name} wins {chips} chips.\nTop Hand: {winning_hand}")
+                        self.result_text.set_text(f"{player.name} wins {chips} chips.\nTop Hand: {winning_hand}\n" + self.equityText(showdown_equity))
                         self.header.set_text(f"{player.name} wins {chips} chips!")
                         self.player_chips = player.chips
                         player_label = self.players.player_labels_list[position]
@@ -935,6 +931,7 @@ class playScreen:
             if (homeswitch):
                 if (self.camwindow != None):
                     self.killCamera()
+                self.cancelAI()
                 self.state = ScreenState.TITLE
                 homeswitch = False
             if (pickleswitch):
@@ -950,7 +947,7 @@ class playScreen:
                     "dynamic_text": self.dynamic_button.text,           # save dynamic button's text
                     "results_displayed": self.results_displayed,        # are game results displayed
 
-                    "aithinking": self.aiThinking,                      # is the ai thinking
+                    "aithinking": self.ai_future != None,               # is the ai thinking
                     "player_actions": self.player_actions,              # used for log window
 
                     "player_index": self.player_index,                  # needed if we save during scanning cards
@@ -989,11 +986,17 @@ class playScreen:
         log_text = log_text[:-1]
         self.logwindow.game_log.set_text(log_text)
 
-    def threadMethod(self):
-        random_time = np.random.randint(2, 7)
-        self.aiThinking = 1
-        time.sleep(random_time)
-        self.aiThinking = 2
+    # Runs on playScreen.ai_executor, the game isn't changed while an AI's move is pending
+    def decideAI(self, game_instance, pos):
+        if game_instance.players[pos].ai_type == "mcts":
+            return self.mcts.decide(game_instance, pos)
+        return Agent.predict(game_instance.get_state_ai(pos))
+
+    # Forget a pending AI move when leaving the game
+    def cancelAI(self):
+        if (self.ai_future != None):
+            self.ai_future.cancel() # the move may already be underway, its result is just never read
+            self.ai_future = None
 
     def delete(self, manager):
         print('PLAY: Deleting objects')
@@ -1019,29 +1022,60 @@ class playScreen:
         self.camClicked = False
         self.camwindow = None
     
-    def scanCard(self):
-        card = self.sendImg(self.camwindow.img) # send lambda call
+    # Cards in the captured frame, at most `max_cards` (as many as are left to scan), in the order they
+    # appear on screen. All of them are classified together, so the whole flop or both hole cards take
+    # one capture. A frame where no card outline is found is classified as a single card
+    def scanCards(self, max_cards):
+        frame = self.camwindow.img
+        crops = CardLocator.crops(frame, max_cards) or [frame]
+        cards = [Card.from_str(label) for label in self.sendImgs(crops)]
         self.camwindow.snaptaken = False
         self.camwindow.drawcam = True
 
-        return card
+        return cards
+
+    # Hand out scanned cards as hole cards, two per seat in `seats` order (seat ids, all still to scan).
+    # The first seat gets the rest of a hand that was partly scanned (self.cards_scanned), so the hands
+    # can be captured one card at a time, one hand at a time or all laid out in seat order in one picture
+    def handOutCards(self, cards, seats):
+        for card in cards:
+            self.cards_scanned.append(card)
+            if (len(self.cards_scanned) == 2):
+                player = self.game_instance.players[seats[0]]
+                player.cards = self.cards_scanned
+                if not player.is_ai:
+                    print("PLAYER %s CARDS:" % (player.name))
+                    print(Card.to_strs(player.cards))
+                self.cards_scanned = []
+                self.player_index = seats.pop(0) + 1
+        self.card_index = len(self.cards_scanned)
+
+    def handsLabel(self, seats):
+        text = "%s's cards - %d of 2" % (self.game_instance.players[seats[0]].name, self.card_index+1)
+        if (len(seats) > 1):
+            text += " (or %d hands at once)" % len(seats)
+        return text
     
-    def sendImg(self, img):
-        img = cv2.resize(img, dsize=(224, 224), interpolation=cv2.INTER_CUBIC)
-        img = np.array(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    def sendImgs(self, imgs):
+        imgs = [prepare_image(img) for img in imgs]
 
         if self.offload_card_detection:
-            # offloaded card detection ai
-            response = classify_card(img)
-            return response
+            # offloaded card detection ai, one batch for all the cards
+            predictions = classify_cards(imgs)
+            for prediction in predictions:
+                print('PLAY: Scanned ' + str(prediction))
+            return [prediction.label for prediction in predictions]
         else:
-            img_bytes = img.tobytes()
-            img_b64 = base64.b64encode(img_bytes).decode('utf-8')
-
-            response = requests.post('URL', json={'b64img': str(img_b64)})
-            response = json.loads(response.text)
+            labels = []
+            for img in imgs:
+                img_bytes = img.tobytes()
+                img_b64 = base64.b64encode(img_bytes).decode('utf-8')
+
+                response = requests.post('URL', json={'b64img': str(img_b64)})
+                response = json.loads(response.text)
+                labels.append(response["class"])
             
-            return response["class"]
+            return labels
         
     def clearTable(self, manager, tablepos):
         self.table.kill()
@@ -1049,52 +1083,32 @@ class playScreen:
         self.table = tableWindow(manager=manager, pos=tablepos)
 
     def updateTable(self, community_cards):
-        suit = None
-        id = None
         for index in range(len(community_cards)):
             card = community_cards[index]
-            if card != 'NA':
-                if card[1] == "H":
-                    suit = "assets/cards/hearts"
-                elif card[1] == "D":
-                    suit = "assets/cards/diamonds"
-                elif card[1] == "C":
-                    suit = "assets/cards/clubs"
-                elif card[1] == "S":
-                    suit = "assets/cards/spades"
-                
-                if card[0] == "T":
-                    id = suit + "/10.png"
-                else:
-                    id = suit + "/" + card[0] + ".png"
-            
+            if card != Card.NA:
                 card_element = getattr(self.table, f"card{index + 1}")
-                card_element.set_image(pygame.image.load(id))
-                #print("Table card " + str(index+1) + " set to " + id)
-
-            index = index + 1
+                card_element.set_image(pygame.image.load(Card.asset_path(card)))
+                #print("Table card " + str(index+1) + " set to " + Card.asset_path(card))
         #print("-- Done updating --")
 
+    # exact equity of the showdown hands on the flop and the turn (see GameInstance.showdown_equity)
+    def equityText(self, showdown_equity):
+        text = ""
+        for street, equities in showdown_equity:
+            text += "Equity on the %s: " % street
+            text += ", ".join("%s %.1f%%" % (self.game_instance.players[position].name, result.equity*100) for position, result in equities.items())
+            text += "\n"
+        return text
+
     def updateResultTable(self, rankings):
         for index in range(len(rankings[0][0][3])):
             card = rankings[0][0][3][index]
-            if card != 'NA':
-                if card[1] == "H":
-                    suit = "assets/cards/hearts"
-                elif card[1] == "D":
-                    suit = "assets/cards/diamonds"
-                elif card[1] == "C":
-                    suit = "assets/cards/clubs"
-                elif card[1] == "S":
-                    suit = "assets/cards/spades"
-                if card[0] == "T":
-                    id = suit + "/10.png"
-                else:
-                    id = suit + "/" + card[0] + ".png"
-            card_element = getattr(self.result_table, f"card{index + 1}")
-            card_element.set_image(pygame.image.load(id))
+            if card != Card.NA:
+                card_element = getattr(self.result_table, f"card{index + 1}")
+                card_element.set_image(pygame.image.load(Card.asset_path(card)))
 
     def killGame(self):
+        self.cancelAI()
         self.game_state = None
         self.player_index = 0
         self.card_index = 0
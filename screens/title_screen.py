@@ -4,6 +4,8 @@ import random, os
 from pygame_gui.elements import UIButton, UILabel, UIWindow
 from objects.screenstate import ScreenState
 from objects.scheme import Scheme
+from local_ml.card_detection import card_model
+from screens.loading_bar import LoadingBar
 
 from webcam import WebcamCapture
 
@@ -25,6 +27,7 @@ class titleScreen:
         self.load_button = None
         self.play_button = None
         self.config = None
+        self.loading_bar = LoadingBar(self.width, self.height)
 
         self.animate = True # animation flag
 
@@ -198,7 +201,12 @@ class titleScreen:
 
             manager.draw_ui(self.window)
 
+            if not card_model.is_ready():
+                self.loading_bar.draw(self.window, card_model.progress, card_model.status)
+
             pygame.display.flip()
+            # the title screen is up, load the card model behind it (does nothing after the first frame)
+            card_model.start()
 
             if (debugswitch):
                 self.state = ScreenState.DEBUG
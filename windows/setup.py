@@ -7,6 +7,7 @@ class setupWindow(pygame_gui.elements.UIWindow):
     player_count = 1
     ai_player_count = 1
     chip_count = 200
+    ai_types = ["agent", "agent"] # Player.AI_TYPES entry of each AI seat
     def __init__(self, manager, pos):
         super().__init__((pos),
                          manager,
@@ -17,6 +18,7 @@ class setupWindow(pygame_gui.elements.UIWindow):
         player_selection = ["1", "2", "3", "4"]
         ai_selection = ["1", "2"]
         money_selection = ["100", "200", "300", "400", "500"]
+        ai_type_selection = ["Agent", "MCTS"]
 
         v_pad = 30
         h_pad = 30
@@ -94,6 +96,34 @@ class setupWindow(pygame_gui.elements.UIWindow):
                                                                        "top_target": self.divider
                                                                    })
         
+        # which AI plays each of the AI seats (up to the largest AI count in ai_dropdown)
+        self.ai_type_dropdowns = []
+        top_target = self.player_money_label
+        for i in range(int(ai_selection[-1])):
+            ai_type_label = pygame_gui.elements.UILabel(pygame.Rect((h_pad, 10), (180, 40)),
+                                                                "AI " + str(i + 1) + " plays by:",
+                                                                manager=manager,
+                                                                object_id="config_window_label",
+                                                                container=self,
+                                                                parent_element=self,
+                                                                anchors={
+                                                                    "left": "left",
+                                                                    "top_target": top_target
+                                                                })
+
+            ai_type_dropdown = pygame_gui.elements.UIDropDownMenu(options_list=ai_type_selection,
+                                                                   starting_option="Agent",
+                                                                   relative_rect=pygame.Rect((h_pad, 10), (100, 40)),
+                                                                   manager=manager,
+                                                                   container=self,
+                                                                   parent_element=self,
+                                                                   anchors={
+                                                                       "left_target": ai_type_label,
+                                                                       "top_target": top_target
+                                                                   })
+            self.ai_type_dropdowns.append(ai_type_dropdown)
+            top_target = ai_type_label
+
         # self.small_blind_label = pygame_gui.elements.UILabel(pygame.Rect((h_pad, 10), (180, 40)),
         #                                                         ("Small blind:"),
         #                                                         manager=manager,
@@ -146,5 +176,6 @@ class setupWindow(pygame_gui.elements.UIWindow):
                 setupWindow.player_count = int(self.players_dropdown.selected_option)
                 setupWindow.ai_player_count = int(self.ai_dropdown.selected_option)
                 setupWindow.chip_count = int(self.player_money_dropdown.selected_option)
+                setupWindow.ai_types = [dropdown.selected_option.lower() for dropdown in self.ai_type_dropdowns]
                 setupWindow.startClicked = True
                 self.kill()
\ No newline at end of file